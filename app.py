@@ -2,116 +2,384 @@
 AuraCast: Flask application. Serves the UI and the podcast generation API.
 Orchestrates parser, LLM, and TTS; no business logic here.
 V2: chunk store for episode list; /api/parse returns upload_id + episodes without Gemini.
+Gemini + TTS endpoints run as background jobs: POST returns 202 + job_id, client polls /api/job/<id>.
 """
+import hashlib
 import logging
+import os
+import re
+import secrets
+import threading
 import time
 import traceback
-import uuid
+from collections import OrderedDict
+from operator import itemgetter
 from pathlib import Path
+from urllib.parse import unquote
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import orjson
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from flask.json.provider import JSONProvider
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 
-import config
+import native
+from config import CONFIG
 from parser import parse_ebook, parse_ebook_chunks, ParsingError
 from llm_generator import (
-    generate_podcast_script,
-    generate_episode_script,
+    astream_podcast_script,
+    astream_episode_script,
+    generate_episode_scripts_batch,
     generate_interrupt_reply,
+    warm_semantic_cache,
     ScriptGenerationError,
 )
-from tts_engine import synthesize_podcast
+from tts_engine import synthesize_podcast, synthesize_podcast_stream
 
-# In-memory chunk store: upload_id -> {"chunks": list[dict], "ts": float}. Evict by TTL and max size.
-_CHUNK_STORE = {}
+# Store limits, bound once so the per-request store helpers do no config lookups
+_CHUNK_STORE_TTL_SEC = CONFIG.CHUNK_STORE_TTL_SEC
+_CHUNK_STORE_MAX_ENTRIES = CONFIG.CHUNK_STORE_MAX_ENTRIES
+_JOB_STORE_TTL_SEC = CONFIG.JOB_STORE_TTL_SEC
+_JOB_STORE_MAX_ENTRIES = CONFIG.JOB_STORE_MAX_ENTRIES
+
+# Raw uploads are copied from the request body in chunks of this size
+UPLOAD_BUFFER_SIZE = 64 * 1024
+
+# In-memory chunk store: upload_id -> {"chunks": list[dict], "episodes": list[dict], "ts": float}, least recently used first.
+# Entries expire lazily when looked up; the oldest is popped when over max size.
+_CHUNK_STORE: "OrderedDict[str, dict]" = OrderedDict()
+# Guards _CHUNK_STORE; cooperative under gevent (threading is monkey-patched in wsgi.py).
+_CHUNK_STORE_LOCK = threading.RLock()
+
+# Background job store: job_id -> {"state": "running"|"done"|"error", "result", "error", "ts"}. Same eviction as chunks.
+_JOB_STORE: "OrderedDict[str, dict]" = OrderedDict()
+_JOB_STORE_LOCK = threading.RLock()
+# Job bodies run Gemini + TTS event loops, so they get real OS threads even under gevent (see native.executor)
+EXECUTOR = native.executor(CONFIG.JOB_WORKERS, thread_name_prefix="auracast-job")
+
+# Names of files we write to UPLOAD_FOLDER / OUTPUT_FOLDER (32 hex chars + extension); the sweeper ignores anything else
+_GENERATED_NAME = re.compile(r"^[0-9a-f]{32}\.(?:pdf|epub|mp3)$")
+_SWEEPER_STOP = threading.Event()
 
 # Ensure upload and output directories exist
-config.UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
-config.OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
+CONFIG.UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+CONFIG.OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, used by jsonify() and request.get_json()."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
 
 app = Flask(__name__)
-app.config["MAX_CONTENT_LENGTH"] = config.MAX_CONTENT_LENGTH
+app.json = OrjsonProvider(app)
+app.config["MAX_CONTENT_LENGTH"] = CONFIG.MAX_CONTENT_LENGTH
+app.config["USE_X_SENDFILE"] = CONFIG.USE_X_SENDFILE
 
 
-def allowed_file(filename: str) -> bool:
-    """Check if filename has an allowed extension."""
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in config.ALLOWED_EXTENSIONS
+_ALLOWED_EXTS = frozenset(e.lower() for e in CONFIG.ALLOWED_EXTENSIONS)
 
 
-def _chunk_store_evict():
-    """Remove expired entries and trim to CHUNK_STORE_MAX_ENTRIES (oldest first)."""
-    now = time.time()
-    ttl = getattr(config, "CHUNK_STORE_TTL_SEC", 3600)
-    max_entries = getattr(config, "CHUNK_STORE_MAX_ENTRIES", 20)
-    expired = [uid for uid, data in _CHUNK_STORE.items() if (now - data["ts"]) > ttl]
-    for uid in expired:
-        del _CHUNK_STORE[uid]
-    if len(_CHUNK_STORE) <= max_entries:
-        return
-    by_ts = sorted(_CHUNK_STORE.items(), key=lambda x: x[1]["ts"])
-    for uid, _ in by_ts[: len(_CHUNK_STORE) - max_entries]:
-        _CHUNK_STORE.pop(uid, None)
+def _file_ext(filename: str) -> str:
+    """Return the lowercased extension of filename ("" if it has none)."""
+    dot = filename.rfind(".")
+    return filename[dot + 1:].lower() if dot >= 0 else ""
+
+
+def _is_raw_upload() -> bool:
+    """True when the client POSTed the file as the raw body (filename in X-Filename) instead of multipart."""
+    return request.mimetype == "application/octet-stream"
+
+
+def _validate_upload() -> tuple[FileStorage | None, str, str]:
+    """
+    Locate the uploaded file (raw body or multipart "file") and check its extension.
+    Returns (file or None for a raw body, filename, lowercased ext). Raises ValueError with the user-facing message.
+    """
+    if _is_raw_upload():
+        file = None
+        filename = unquote(request.headers.get("X-Filename", ""))
+    else:
+        if "file" not in request.files:
+            raise ValueError("No file provided")
+        file = request.files["file"]
+        filename = file.filename or ""
+    if filename == "":
+        raise ValueError("No file selected")
+    ext = _file_ext(filename)
+    if ext not in _ALLOWED_EXTS:
+        raise ValueError("Only PDF and EPUB files are allowed")
+    return file, filename, ext
+
+
+def _stream_to_disk(upload_path: Path, max_bytes: int) -> None:
+    """
+    Copy the raw request body to upload_path in UPLOAD_BUFFER_SIZE chunks, so the upload
+    is never held in memory. Raises RequestEntityTooLarge past max_bytes.
+    """
+    total = 0
+    with open(upload_path, "wb", buffering=0) as fh:
+        while True:
+            buf = request.stream.read(UPLOAD_BUFFER_SIZE)
+            if not buf:
+                break
+            total += len(buf)
+            if total > max_bytes:
+                raise RequestEntityTooLarge()
+            fh.write(buf)
+
+
+def _save_upload(file: FileStorage | None, upload_path: Path) -> None:
+    """
+    Write the upload to upload_path: the raw body when file is None, else the multipart file.
+    Any failure (too large, disk error, client disconnect) removes the partial file before re-raising.
+    """
+    try:
+        if file is None:
+            _stream_to_disk(upload_path, CONFIG.MAX_CONTENT_LENGTH)
+        else:
+            file.save(str(upload_path))
+    except BaseException:
+        upload_path.unlink(missing_ok=True)
+        raise
+
+
+# (id, title) of a chunk, fetched in one call when building the episode list
+_EPISODE_FIELDS = itemgetter("id", "title")
+
+
+def _chunk_store_entry(upload_id: str) -> dict | None:
+    """Return the store entry for upload_id or None if missing/expired. Marks the entry most recently used."""
+    with _CHUNK_STORE_LOCK:
+        data = _CHUNK_STORE.get(upload_id)
+        if not data:
+            return None
+        if (time.time() - data["ts"]) > _CHUNK_STORE_TTL_SEC:
+            del _CHUNK_STORE[upload_id]
+            return None
+        _CHUNK_STORE.move_to_end(upload_id)
+        return data
 
 
 def _chunk_store_get(upload_id: str) -> list[dict] | None:
     """Return list of chunks for upload_id or None if missing/expired."""
-    _chunk_store_evict()
-    data = _CHUNK_STORE.get(upload_id)
-    if not data:
-        return None
-    ttl = getattr(config, "CHUNK_STORE_TTL_SEC", 3600)
-    if (time.time() - data["ts"]) > ttl:
-        del _CHUNK_STORE[upload_id]
-        return None
-    return data["chunks"]
+    data = _chunk_store_entry(upload_id)
+    return data["chunks"] if data else None
+
+
+def _chunk_store_episodes(upload_id: str) -> list[dict] | None:
+    """Return the episode list (id, title only) for upload_id or None if missing/expired."""
+    data = _chunk_store_entry(upload_id)
+    return data["episodes"] if data else None
+
 
+def _chunk_store_set(upload_id: str, chunks: list[dict]) -> list[dict]:
+    """
+    Store chunks for upload_id with their episode list; refresh ts. Returns the episode list.
+    Drops least recently used entries past CHUNK_STORE_MAX_ENTRIES.
+    """
+    episodes = [{"id": i, "title": t} for i, t in map(_EPISODE_FIELDS, chunks)]
+    with _CHUNK_STORE_LOCK:
+        _CHUNK_STORE[upload_id] = {"chunks": chunks, "episodes": episodes, "ts": time.time()}
+        _CHUNK_STORE.move_to_end(upload_id)
+        while len(_CHUNK_STORE) > _CHUNK_STORE_MAX_ENTRIES:
+            _CHUNK_STORE.popitem(last=False)
+    return episodes
+
+
+class JobError(Exception):
+    """Raised inside a background job with the user-facing error message."""
+    pass
+
+
+def _job_store_get(job_id: str) -> dict | None:
+    """Return a copy of the job record or None if missing/expired."""
+    with _JOB_STORE_LOCK:
+        job = _JOB_STORE.get(job_id)
+        if not job:
+            return None
+        if (time.time() - job["ts"]) > _JOB_STORE_TTL_SEC:
+            del _JOB_STORE[job_id]
+            return None
+        _JOB_STORE.move_to_end(job_id)
+        return dict(job)
+
+
+def _job_store_set(job_id: str, job: dict) -> None:
+    """Store job record (ts set to now). Drops least recently used jobs past JOB_STORE_MAX_ENTRIES."""
+    with _JOB_STORE_LOCK:
+        _JOB_STORE[job_id] = {**job, "ts": time.time()}
+        _JOB_STORE.move_to_end(job_id)
+        while len(_JOB_STORE) > _JOB_STORE_MAX_ENTRIES:
+            _JOB_STORE.popitem(last=False)
+
+
+def _job_store_finish(job_id: str, result: dict | None = None, error: str | None = None) -> None:
+    """Mark job done (result) or failed (error). No-op if the job was already evicted."""
+    with _JOB_STORE_LOCK:
+        if job_id not in _JOB_STORE:
+            return
+        _job_store_set(job_id, {"state": "error" if error else "done", "result": result, "error": error})
+
+
+def _run_job(job_id: str, fn, *args) -> None:
+    """Executor entry point: run fn(*args) and record its result or error on the job."""
+    try:
+        result = fn(*args)
+    except JobError as e:
+        _job_store_finish(job_id, error=str(e))
+    except Exception:
+        logging.exception("Job %s failed", job_id)
+        _job_store_finish(job_id, error="Something went wrong. Please try again.")
+    else:
+        _job_store_finish(job_id, result=result)
 
-def _chunk_store_set(upload_id: str, chunks: list[dict]) -> None:
-    """Store chunks for upload_id; refresh ts. Evicts if over capacity."""
-    _chunk_store_evict()
-    _CHUNK_STORE[upload_id] = {"chunks": chunks, "ts": time.time()}
+
+def _submit_job(fn, *args):
+    """Register a running job, hand fn(*args) to the executor and return a 202 response with its job_id."""
+    job_id = secrets.token_hex(16)
+    _job_store_set(job_id, {"state": "running", "result": None, "error": None})
+    EXECUTOR.submit(_run_job, job_id, fn, *args)
+    return jsonify({"job_id": job_id}), 202
+
+
+def _sweep_folders() -> None:
+    """
+    Delete orphaned files: uploads whose upload_id is no longer in the chunk store and older than
+    2 x CHUNK_STORE_TTL_SEC, and generated MP3s older than OUTPUT_TTL_SEC. Uses os.scandir and only
+    stats entries with generated names.
+    """
+    now = time.time()
+    with _CHUNK_STORE_LOCK:
+        live_uploads = set(_CHUNK_STORE)
+    sweeps = (
+        (CONFIG.UPLOAD_FOLDER, 2 * _CHUNK_STORE_TTL_SEC, live_uploads),
+        (CONFIG.OUTPUT_FOLDER, CONFIG.OUTPUT_TTL_SEC, set()),
+    )
+    for folder, max_age, keep in sweeps:
+        try:
+            entries = os.scandir(folder)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if not _GENERATED_NAME.match(entry.name) or entry.name.split(".", 1)[0] in keep:
+                    continue
+                try:
+                    if (now - entry.stat().st_mtime) > max_age:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+
+
+def _sweeper_loop() -> None:
+    """Background thread (a greenlet under gevent): sweep the folders every SWEEP_INTERVAL_SEC."""
+    while not _SWEEPER_STOP.wait(CONFIG.SWEEP_INTERVAL_SEC):
+        try:
+            _sweep_folders()
+        except Exception:
+            logging.exception("Folder sweep failed")
+
+
+_BACKGROUND_STARTED = False
+_BACKGROUND_START_LOCK = threading.Lock()
+
+
+def start_background() -> None:
+    """
+    Start the process's background work once: the sweeper thread, and the semantic-cache warm-up on a native
+    thread (it loads an embedding model). Called by the server entry points (wsgi.py, the gunicorn
+    post_worker_init hook, the dev server below) rather than at import, so importing app has no side effects.
+    """
+    global _BACKGROUND_STARTED
+    with _BACKGROUND_START_LOCK:
+        if _BACKGROUND_STARTED:
+            return
+        threading.Thread(target=_sweeper_loop, name="auracast-sweeper", daemon=True).start()
+        native.spawn(warm_semantic_cache)
+        _BACKGROUND_STARTED = True
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def handle_too_large(e):
+    """Return a JSON error (not Werkzeug's HTML page) when an upload exceeds MAX_CONTENT_LENGTH."""
+    max_mb = CONFIG.MAX_CONTENT_LENGTH // (1024 * 1024)
+    return jsonify({"error": f"File is too large (max {max_mb} MB)."}), 413
+
+
+# The UI template has no per-request data: render it once and serve the cached bytes (html, etag).
+_INDEX_PAGE = None
+
+
+def _index_page() -> tuple[bytes, str]:
+    """Render index.html on first use (every time in debug mode so template edits show up)."""
+    global _INDEX_PAGE
+    if _INDEX_PAGE is None or app.debug:
+        html = render_template("index.html").encode("utf-8")
+        _INDEX_PAGE = (html, hashlib.blake2b(html, digest_size=8).hexdigest())
+    return _INDEX_PAGE
 
 
 @app.route("/")
 def index():
-    """Serve the single-page UI."""
-    return render_template("index.html")
+    """Serve the single-page UI. Answers If-None-Match with 304 via the ETag."""
+    html, etag = _index_page()
+    response = Response(html, mimetype="text/html", headers={"Cache-Control": "public, max-age=60"})
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route("/api/parse", methods=["POST"])
 def api_parse():
     """
     Parse uploaded eBook into chunks. Store chunks server-side; return upload_id and episode list (id, title only).
+    Accepts the file as the raw body (application/octet-stream + X-Filename) or as multipart field "file".
     Does not call Gemini or TTS. File is kept for later episode generation.
     """
-    if "file" not in request.files:
-        return jsonify({"error": "No file provided"}), 400
-    file = request.files["file"]
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-    if not allowed_file(file.filename):
-        return jsonify({"error": "Only PDF and EPUB files are allowed"}), 400
-
-    upload_id = uuid.uuid4().hex
-    ext = file.filename.rsplit(".", 1)[1].lower()
+    try:
+        file, filename, ext = _validate_upload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    upload_id = secrets.token_hex(16)
     upload_name = f"{upload_id}.{ext}"
-    upload_path = config.UPLOAD_FOLDER / upload_name
+    upload_path = CONFIG.UPLOAD_FOLDER / upload_name
 
     try:
-        file.save(str(upload_path))
+        _save_upload(file, upload_path)
     except OSError:
         return jsonify({"error": "Failed to save upload."}), 500
 
     try:
-        chunks = parse_ebook_chunks(str(upload_path), file.filename)
+        chunks = parse_ebook_chunks(str(upload_path), filename)
     except ParsingError as e:
         upload_path.unlink(missing_ok=True)
         return jsonify({"error": str(e)}), 400
     except Exception:
+        logging.exception("Failed to parse upload %s", secure_filename(filename))
         upload_path.unlink(missing_ok=True)
         return jsonify({"error": "Failed to parse the file. Please try another PDF or EPUB."}), 500
 
-    _chunk_store_set(upload_id, chunks)
-    episodes = [{"id": c["id"], "title": c["title"]} for c in chunks]
+    episodes = _chunk_store_set(upload_id, chunks)
+    return jsonify({"upload_id": upload_id, "episodes": episodes})
+
+
+@app.route("/api/episodes/<upload_id>")
+def api_episodes(upload_id):
+    """Return the episode list (id, title) of an earlier /api/parse, from the chunk store."""
+    episodes = _chunk_store_episodes(upload_id)
+    if episodes is None:
+        return jsonify({"error": "Session expired or invalid. Please re-upload the book."}), 404
     return jsonify({"upload_id": upload_id, "episodes": episodes})
 
 
@@ -128,20 +396,78 @@ def api_demo_episode():
     """
     Generate a demo episode: fixed script + TTS only (no Gemini). So the app always has a working example.
     """
-    out_name = f"{uuid.uuid4().hex}.mp3"
-    out_path = config.OUTPUT_FOLDER / out_name
+    out_name = f"{secrets.token_hex(16)}.mp3"
+    out_path = CONFIG.OUTPUT_FOLDER / out_name
     try:
         synthesize_podcast(DEMO_SCRIPT, str(out_path))
     except Exception as e:
         out_path.unlink(missing_ok=True)
-        return jsonify({"error": f"Audio synthesis failed: {e}. Check that ffmpeg is installed."}), 500
+        return jsonify({"error": f"Audio synthesis failed: {e}."}), 500
     return jsonify({"script": DEMO_SCRIPT, "audio_url": f"/output/{out_name}"})
 
 
+def _run_episode_job(chunk_text: str, user_prompt: str) -> dict:
+    """Background job: Gemini episode script streamed into TTS. Returns {script, audio_url}."""
+    out_name = f"{secrets.token_hex(16)}.mp3"
+    out_path = CONFIG.OUTPUT_FOLDER / out_name
+    try:
+        # Each dialogue turn is synthesized as soon as Gemini has written it
+        script = synthesize_podcast_stream(astream_episode_script(chunk_text, user_prompt), str(out_path))
+    except ScriptGenerationError as e:
+        out_path.unlink(missing_ok=True)
+        raise JobError(str(e)) from e
+    except Exception as e:
+        out_path.unlink(missing_ok=True)
+        raise JobError(f"Audio synthesis failed: {e}.") from e
+
+    return {"script": script, "audio_url": f"/output/{out_name}"}
+
+
+def _run_episode_batch_job(episode_ids: list[int], chunk_texts: list[str], user_prompt: str) -> dict:
+    """Background job: scripts for several episodes in one Gemini call (no TTS). Returns {episodes: [{id, script}]}."""
+    try:
+        scripts = generate_episode_scripts_batch(chunk_texts, user_prompt)
+    except ScriptGenerationError as e:
+        raise JobError(str(e)) from e
+    except Exception as e:
+        raise JobError("Failed to generate scripts. Please try again.") from e
+    return {"episodes": [{"id": i, "script": script} for i, script in zip(episode_ids, scripts)]}
+
+
+def _run_ask_hosts_job(question: str, episode_script: list[dict], chunk_text: str | None) -> dict:
+    """Background job: Gemini interrupt reply + TTS. Returns {script, audio_url}."""
+    try:
+        script = generate_interrupt_reply(question, episode_script, chunk_text=chunk_text)
+    except ScriptGenerationError as e:
+        raise JobError(str(e)) from e
+    except Exception as e:
+        raise JobError("Failed to generate reply. Please try again.") from e
+
+    out_name = f"{secrets.token_hex(16)}.mp3"
+    out_path = CONFIG.OUTPUT_FOLDER / out_name
+    try:
+        synthesize_podcast(script, str(out_path))
+    except Exception as e:
+        out_path.unlink(missing_ok=True)
+        raise JobError(f"Audio synthesis failed: {e}.") from e
+
+    return {"script": script, "audio_url": f"/output/{out_name}"}
+
+
+@app.route("/api/job/<job_id>")
+def api_job(job_id):
+    """Poll a background job. Returns {job_id, state, result, error}; result is set once state is "done"."""
+    job = _job_store_get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found or expired."}), 404
+    return jsonify({"job_id": job_id, "state": job["state"], "result": job["result"], "error": job["error"]})
+
+
 @app.route("/api/generate_episode", methods=["POST"])
 def api_generate_episode():
     """
-    Generate one episode: lookup chunk by upload_id + episode_id, run Gemini + TTS, return script + audio_url.
+    Generate one episode: lookup chunk by upload_id + episode_id, then run Gemini + TTS as a background job.
+    Returns 202 {job_id}; the finished job's result is {script, audio_url}.
     """
     if not request.is_json:
         return jsonify({"error": "Content-Type must be application/json"}), 400
@@ -163,28 +489,49 @@ def api_generate_episode():
     if not chunk:
         return jsonify({"error": "Episode not found."}), 404
 
-    try:
-        script = generate_episode_script(chunk["text"], user_prompt)
-    except ScriptGenerationError as e:
-        return jsonify({"error": str(e)}), 502
-    except Exception as e:
-        return jsonify({"error": "Failed to generate script. Please try again."}), 500
+    return _submit_job(_run_episode_job, chunk["text"], user_prompt)
 
-    out_name = f"{uuid.uuid4().hex}.mp3"
-    out_path = config.OUTPUT_FOLDER / out_name
+
+@app.route("/api/generate_episodes_batch", methods=["POST"])
+def api_generate_episodes_batch():
+    """
+    Generate scripts (no audio) for several episodes of one upload with a single Gemini call, as a background job.
+    Body: {upload_id, episode_ids: [...], user_prompt}. Returns 202 {job_id}; the result is {episodes: [{id, script}]}.
+    Results land in the script cache, so a following /api/generate_episode for these ids only runs TTS (one sent
+    while this job is still running waits for it instead of calling Gemini again).
+    """
+    if not request.is_json:
+        return jsonify({"error": "Content-Type must be application/json"}), 400
+    data = request.get_json() or {}
+    upload_id = data.get("upload_id")
+    episode_ids = data.get("episode_ids")
+    user_prompt = (data.get("user_prompt") or "").strip()
+    if not upload_id:
+        return jsonify({"error": "upload_id is required"}), 400
+    if not episode_ids or not isinstance(episode_ids, list):
+        return jsonify({"error": "episode_ids (array) is required"}), 400
+    if len(episode_ids) > CONFIG.BATCH_MAX_EPISODES:
+        return jsonify({"error": f"At most {CONFIG.BATCH_MAX_EPISODES} episodes per batch."}), 400
     try:
-        synthesize_podcast(script, str(out_path))
-    except Exception as e:
-        out_path.unlink(missing_ok=True)
-        return jsonify({"error": f"Audio synthesis failed: {e}. Check that ffmpeg is installed."}), 500
+        episode_ids = [int(i) for i in episode_ids]
+    except (TypeError, ValueError):
+        return jsonify({"error": "episode_ids must be integers"}), 400
+
+    chunks = _chunk_store_get(upload_id)
+    if not chunks:
+        return jsonify({"error": "Session expired or invalid. Please re-upload the book."}), 404
+    by_id = {c.get("id"): c for c in chunks}
+    if any(i not in by_id for i in episode_ids):
+        return jsonify({"error": "Episode not found."}), 404
 
-    return jsonify({"script": script, "audio_url": f"/output/{out_name}"})
+    return _submit_job(_run_episode_batch_job, episode_ids, [by_id[i]["text"] for i in episode_ids], user_prompt)
 
 
 @app.route("/api/ask_hosts", methods=["POST"])
 def api_ask_hosts():
     """
-    User interrupted the podcast with a question. Generate a short 2-line Host A/B reply, synthesize, return script + audio_url.
+    User interrupted the podcast with a question. Generate a short 2-line Host A/B reply and synthesize it
+    as a background job. Returns 202 {job_id}; the finished job's result is {script, audio_url}.
     """
     if not request.is_json:
         return jsonify({"error": "Content-Type must be application/json"}), 400
@@ -197,80 +544,52 @@ def api_ask_hosts():
     if not episode_script or not isinstance(episode_script, list):
         return jsonify({"error": "episode_script (array) is required"}), 400
 
-    try:
-        script = generate_interrupt_reply(
-            question,
-            episode_script,
-            chunk_text=(chunk_text if chunk_text else None),
-        )
-    except ScriptGenerationError as e:
-        return jsonify({"error": str(e)}), 502
-    except Exception as e:
-        return jsonify({"error": "Failed to generate reply. Please try again."}), 500
-
-    out_name = f"{uuid.uuid4().hex}.mp3"
-    out_path = config.OUTPUT_FOLDER / out_name
-    try:
-        synthesize_podcast(script, str(out_path))
-    except Exception as e:
-        out_path.unlink(missing_ok=True)
-        return jsonify({"error": f"Audio synthesis failed: {e}."}), 500
-
-    return jsonify({"script": script, "audio_url": f"/output/{out_name}"})
+    return _submit_job(_run_ask_hosts_job, question, episode_script, chunk_text if chunk_text else None)
 
 
 @app.route("/api/generate-podcast", methods=["POST"])
 def generate_podcast():
     """
-    Run full pipeline: save upload → parse → Gemini script → TTS → return script + audio URL.
+    Run full pipeline: save upload → parse → Gemini script streamed into TTS → return script + audio URL.
     """
-    if "file" not in request.files:
-        return jsonify({"error": "No file provided"}), 400
-    file = request.files["file"]
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-    if not allowed_file(file.filename):
-        return jsonify({"error": "Only PDF and EPUB files are allowed"}), 400
-
-    ext = file.filename.rsplit(".", 1)[1].lower()
-    upload_name = f"{uuid.uuid4().hex}.{ext}"
-    upload_path = config.UPLOAD_FOLDER / upload_name
+    try:
+        file, filename, ext = _validate_upload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    upload_name = f"{secrets.token_hex(16)}.{ext}"
+    upload_path = CONFIG.UPLOAD_FOLDER / upload_name
 
     try:
-        file.save(str(upload_path))
+        _save_upload(file, upload_path)
     except OSError as e:
         return jsonify({"error": "Failed to save upload."}), 500
 
     try:
         # 1. Extract text from eBook
-        extracted_text = parse_ebook(str(upload_path), file.filename)
+        extracted_text = parse_ebook(str(upload_path), filename)
     except ParsingError as e:
         upload_path.unlink(missing_ok=True)
         return jsonify({"error": str(e)}), 400
     except Exception as e:
+        logging.exception("Failed to parse upload %s", secure_filename(filename))
         upload_path.unlink(missing_ok=True)
         return jsonify({"error": "Failed to parse the file. Please try another PDF or EPUB."}), 500
 
+    out_name = f"{secrets.token_hex(16)}.mp3"
+    out_path = CONFIG.OUTPUT_FOLDER / out_name
+
     try:
-        # 2. Generate podcast script with Gemini
-        script = generate_podcast_script(extracted_text)
+        # 2. Stream the Gemini script into TTS (each turn is synthesized as soon as it is complete) and merge to one MP3
+        script = synthesize_podcast_stream(astream_podcast_script(extracted_text), str(out_path))
     except ScriptGenerationError as e:
         upload_path.unlink(missing_ok=True)
+        out_path.unlink(missing_ok=True)
         return jsonify({"error": str(e)}), 502
-    except Exception as e:
-        upload_path.unlink(missing_ok=True)
-        return jsonify({"error": "Failed to generate script. Please try again."}), 500
-
-    out_name = f"{uuid.uuid4().hex}.mp3"
-    out_path = config.OUTPUT_FOLDER / out_name
-
-    try:
-        # 3. Synthesize audio and merge to one MP3
-        synthesize_podcast(script, str(out_path))
     except Exception as e:
         upload_path.unlink(missing_ok=True)
         out_path.unlink(missing_ok=True)
-        return jsonify({"error": f"Audio synthesis failed: {e}. Check that ffmpeg is installed."}), 500
+        return jsonify({"error": f"Audio synthesis failed: {e}."}), 500
 
     upload_path.unlink(missing_ok=True)
     return jsonify({
@@ -282,8 +601,13 @@ def generate_podcast():
 
 @app.route("/output/<path:filename>")
 def serve_output(filename):
-    """Serve generated MP3 files from the output folder."""
-    return send_from_directory(config.OUTPUT_FOLDER, filename, mimetype="audio/mpeg")
+    """
+    Serve generated MP3 files from the output folder. Supports Range/304 (conditional) for <audio> seeking;
+    with USE_X_SENDFILE the proxy streams the file. Names are random and never reused, so cache forever.
+    """
+    response = send_from_directory(CONFIG.OUTPUT_FOLDER, filename, mimetype="audio/mpeg", conditional=True)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 # Theme backgrounds: served from static/images/ (deployed with app; supports .png, .jpg, .webp)
@@ -305,5 +629,7 @@ def serve_bg(name):
 
 
 if __name__ == "__main__":
+    # Dev server only; use `python wsgi.py` or gunicorn (gunicorn.conf.py) for concurrent requests.
     # Use 5001 by default; macOS often reserves 5000 for AirPlay Receiver
+    start_background()
     app.run(debug=True, port=5001)
@@ -1,7 +1,9 @@
 """
 Configuration for AuraCast. Loads settings from environment; no secrets in code.
+Settings are read once at import into the frozen CONFIG; module-level names mirror it for `config.X` callers.
 """
 import os
+from dataclasses import dataclass
 from pathlib import Path
 
 # Load .env so GEMINI_API_KEY is available
@@ -14,32 +16,150 @@ except ImportError:
 # Base directory (project root)
 BASE_DIR = Path(__file__).resolve().parent
 
-# API key from environment only
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
-
-# Upload and output paths
-UPLOAD_FOLDER = BASE_DIR / "uploads"
-OUTPUT_FOLDER = BASE_DIR / "output"
-
-# Max upload size (e.g. 50 MB)
-MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 50 * 1024 * 1024))
-
-# Allowed extensions for eBooks
-ALLOWED_EXTENSIONS = {"pdf", "epub"}
-
-# Max extracted text length (parser); further cap before sending to API
-MAX_TEXT_LENGTH = int(os.environ.get("MAX_TEXT_LENGTH", 300_000))
-# Max characters per chunk (for episode generation). Defaults to GEMINI_MAX_INPUT_CHARS.
-GEMINI_MAX_INPUT_CHARS = int(os.environ.get("GEMINI_MAX_INPUT_CHARS", 30_000))
-MAX_CHUNK_CHARS = int(os.environ.get("MAX_CHUNK_CHARS", GEMINI_MAX_INPUT_CHARS))
-# PDF chunking: pages per chunk when parsing to episodes
-PDF_CHUNK_PAGES = int(os.environ.get("PDF_CHUNK_PAGES", 8))
-# Chunk store (in-memory): TTL in seconds and max number of uploads
-CHUNK_STORE_TTL_SEC = int(os.environ.get("CHUNK_STORE_TTL_SEC", 3600))
-CHUNK_STORE_MAX_ENTRIES = int(os.environ.get("CHUNK_STORE_MAX_ENTRIES", 20))
-
-# Gemini model and generation settings
-GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
-GEMINI_TIMEOUT = int(os.environ.get("GEMINI_TIMEOUT", 120))
-# Seconds to wait before retrying after a rate-limit (free tier: 30–60 often helps)
-RETRY_DELAY_SEC = int(os.environ.get("RETRY_DELAY_SEC", 30))
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Immutable application settings (see _from_env for environment variables and defaults)."""
+
+    # API key from environment only
+    GEMINI_API_KEY: str
+    # Upload and output paths
+    UPLOAD_FOLDER: Path
+    OUTPUT_FOLDER: Path
+    # Let the reverse proxy send generated MP3s via X-Sendfile (only if it supports that header)
+    USE_X_SENDFILE: bool
+    # Max upload size (e.g. 50 MB)
+    MAX_CONTENT_LENGTH: int
+    # Allowed extensions for eBooks
+    ALLOWED_EXTENSIONS: frozenset[str]
+    # Max extracted text length (parser); further cap before sending to API
+    MAX_TEXT_LENGTH: int
+    # Max characters sent to Gemini per request
+    GEMINI_MAX_INPUT_CHARS: int
+    # Max characters per chunk (for episode generation). Defaults to GEMINI_MAX_INPUT_CHARS.
+    MAX_CHUNK_CHARS: int
+    # PDF chunking: pages per chunk when parsing to episodes
+    PDF_CHUNK_PAGES: int
+    # PDF chunking: worker processes for page-range extraction (1 = parse in the request process)
+    PDF_PARSE_WORKERS: int
+    # Chunk store (in-memory): TTL in seconds and max number of uploads
+    CHUNK_STORE_TTL_SEC: int
+    CHUNK_STORE_MAX_ENTRIES: int
+    # Background jobs (Gemini + TTS): worker threads, result TTL in seconds and max number of jobs kept
+    JOB_WORKERS: int
+    JOB_STORE_TTL_SEC: int
+    JOB_STORE_MAX_ENTRIES: int
+    # Disk sweeper: generated MP3s older than OUTPUT_TTL_SEC are deleted; runs every SWEEP_INTERVAL_SEC
+    OUTPUT_TTL_SEC: int
+    SWEEP_INTERVAL_SEC: int
+    # TTS: max Edge TTS segment requests in flight per episode
+    TTS_CONCURRENCY: int
+    # Gemini model and generation settings
+    GEMINI_MODEL: str
+    GEMINI_TIMEOUT: int
+    # Gemini max_output_tokens for a full podcast / one episode (a truncated script is retried once with twice the cap)
+    PODCAST_MAX_OUT: int
+    EPISODE_MAX_OUT: int
+    # In-memory Gemini script cache: max entries and TTL in seconds
+    SCRIPT_CACHE_MAX: int
+    SCRIPT_CACHE_TTL_SEC: int
+    # Persistent (diskcache) script cache shared by all workers: directory ("" disables) and TTL in seconds
+    SCRIPT_DISK_CACHE_DIR: str
+    SCRIPT_DISK_CACHE_TTL_SEC: int
+    # Optional semantic cache for full-podcast scripts (sentence-transformers + hnswlib): a new book of about the
+    # same length whose middle embeds within SEM_CACHE_MIN_SIM (cosine) of an earlier one reuses that script.
+    # Off unless SEM_CACHE=1; loaded at server startup.
+    SEM_CACHE: bool
+    SEM_CACHE_DIR: str
+    SEM_CACHE_MODEL: str
+    SEM_CACHE_MIN_SIM: float
+    # Seconds to wait before retrying after a rate-limit (free tier: 30–60 often helps)
+    RETRY_DELAY_SEC: int
+    # Gemini requests per minute for the whole app, smoothed by a token bucket before 429s happen (0 disables).
+    # Each web worker process gets GEMINI_QPM / WEB_CONCURRENCY (same worker count as gunicorn.conf.py).
+    GEMINI_QPM: int
+    WEB_CONCURRENCY: int
+    # Max episodes sent to Gemini in one batched prompt (/api/generate_episodes_batch)
+    BATCH_MAX_EPISODES: int
+
+
+def _from_env() -> Config:
+    """Build Config from environment variables (after .env is loaded)."""
+    gemini_max_input_chars = int(os.environ.get("GEMINI_MAX_INPUT_CHARS", 30_000))
+    return Config(
+        GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", ""),
+        UPLOAD_FOLDER=BASE_DIR / "uploads",
+        OUTPUT_FOLDER=BASE_DIR / "output",
+        USE_X_SENDFILE=os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes"),
+        MAX_CONTENT_LENGTH=int(os.environ.get("MAX_CONTENT_LENGTH", 50 * 1024 * 1024)),
+        ALLOWED_EXTENSIONS=frozenset({"pdf", "epub"}),
+        MAX_TEXT_LENGTH=int(os.environ.get("MAX_TEXT_LENGTH", 300_000)),
+        GEMINI_MAX_INPUT_CHARS=gemini_max_input_chars,
+        MAX_CHUNK_CHARS=int(os.environ.get("MAX_CHUNK_CHARS", gemini_max_input_chars)),
+        PDF_CHUNK_PAGES=int(os.environ.get("PDF_CHUNK_PAGES", 8)),
+        PDF_PARSE_WORKERS=int(os.environ.get("PDF_PARSE_WORKERS", os.cpu_count() or 1)),
+        CHUNK_STORE_TTL_SEC=int(os.environ.get("CHUNK_STORE_TTL_SEC", 3600)),
+        CHUNK_STORE_MAX_ENTRIES=int(os.environ.get("CHUNK_STORE_MAX_ENTRIES", 20)),
+        JOB_WORKERS=int(os.environ.get("JOB_WORKERS", 4)),
+        JOB_STORE_TTL_SEC=int(os.environ.get("JOB_STORE_TTL_SEC", 3600)),
+        JOB_STORE_MAX_ENTRIES=int(os.environ.get("JOB_STORE_MAX_ENTRIES", 200)),
+        OUTPUT_TTL_SEC=int(os.environ.get("OUTPUT_TTL_SEC", 24 * 3600)),
+        SWEEP_INTERVAL_SEC=int(os.environ.get("SWEEP_INTERVAL_SEC", 300)),
+        TTS_CONCURRENCY=int(os.environ.get("TTS_CONCURRENCY", 8)),
+        GEMINI_MODEL=os.environ.get("GEMINI_MODEL", "gemini-1.5-flash"),
+        GEMINI_TIMEOUT=int(os.environ.get("GEMINI_TIMEOUT", 120)),
+        PODCAST_MAX_OUT=int(os.environ.get("PODCAST_MAX_OUT", 1600)),
+        EPISODE_MAX_OUT=int(os.environ.get("EPISODE_MAX_OUT", 900)),
+        SCRIPT_CACHE_MAX=int(os.environ.get("SCRIPT_CACHE_MAX", 128)),
+        SCRIPT_CACHE_TTL_SEC=int(os.environ.get("SCRIPT_CACHE_TTL_SEC", 24 * 3600)),
+        SCRIPT_DISK_CACHE_DIR=os.environ.get("SCRIPT_DISK_CACHE_DIR", str(BASE_DIR / ".cache" / "gemini")),
+        SCRIPT_DISK_CACHE_TTL_SEC=int(os.environ.get("SCRIPT_DISK_CACHE_TTL_SEC", 7 * 24 * 3600)),
+        SEM_CACHE=os.environ.get("SEM_CACHE", "").lower() in ("1", "true", "yes"),
+        SEM_CACHE_DIR=os.environ.get("SEM_CACHE_DIR", str(BASE_DIR / ".cache" / "semcache")),
+        SEM_CACHE_MODEL=os.environ.get("SEM_CACHE_MODEL", "all-MiniLM-L6-v2"),
+        SEM_CACHE_MIN_SIM=float(os.environ.get("SEM_CACHE_MIN_SIM", 0.97)),
+        RETRY_DELAY_SEC=int(os.environ.get("RETRY_DELAY_SEC", 30)),
+        GEMINI_QPM=int(os.environ.get("GEMINI_QPM", 14)),
+        WEB_CONCURRENCY=int(os.environ.get("WEB_CONCURRENCY", 2)),
+        BATCH_MAX_EPISODES=int(os.environ.get("BATCH_MAX_EPISODES", 4)),
+    )
+
+
+CONFIG = _from_env()
+
+# Module-level aliases (config.GEMINI_MODEL, ...) for modules that read settings via getattr(config, ...)
+GEMINI_API_KEY = CONFIG.GEMINI_API_KEY
+UPLOAD_FOLDER = CONFIG.UPLOAD_FOLDER
+OUTPUT_FOLDER = CONFIG.OUTPUT_FOLDER
+USE_X_SENDFILE = CONFIG.USE_X_SENDFILE
+MAX_CONTENT_LENGTH = CONFIG.MAX_CONTENT_LENGTH
+ALLOWED_EXTENSIONS = CONFIG.ALLOWED_EXTENSIONS
+MAX_TEXT_LENGTH = CONFIG.MAX_TEXT_LENGTH
+GEMINI_MAX_INPUT_CHARS = CONFIG.GEMINI_MAX_INPUT_CHARS
+MAX_CHUNK_CHARS = CONFIG.MAX_CHUNK_CHARS
+PDF_CHUNK_PAGES = CONFIG.PDF_CHUNK_PAGES
+PDF_PARSE_WORKERS = CONFIG.PDF_PARSE_WORKERS
+CHUNK_STORE_TTL_SEC = CONFIG.CHUNK_STORE_TTL_SEC
+CHUNK_STORE_MAX_ENTRIES = CONFIG.CHUNK_STORE_MAX_ENTRIES
+JOB_WORKERS = CONFIG.JOB_WORKERS
+JOB_STORE_TTL_SEC = CONFIG.JOB_STORE_TTL_SEC
+JOB_STORE_MAX_ENTRIES = CONFIG.JOB_STORE_MAX_ENTRIES
+OUTPUT_TTL_SEC = CONFIG.OUTPUT_TTL_SEC
+SWEEP_INTERVAL_SEC = CONFIG.SWEEP_INTERVAL_SEC
+TTS_CONCURRENCY = CONFIG.TTS_CONCURRENCY
+GEMINI_MODEL = CONFIG.GEMINI_MODEL
+GEMINI_TIMEOUT = CONFIG.GEMINI_TIMEOUT
+PODCAST_MAX_OUT = CONFIG.PODCAST_MAX_OUT
+EPISODE_MAX_OUT = CONFIG.EPISODE_MAX_OUT
+SCRIPT_CACHE_MAX = CONFIG.SCRIPT_CACHE_MAX
+SCRIPT_CACHE_TTL_SEC = CONFIG.SCRIPT_CACHE_TTL_SEC
+SCRIPT_DISK_CACHE_DIR = CONFIG.SCRIPT_DISK_CACHE_DIR
+SCRIPT_DISK_CACHE_TTL_SEC = CONFIG.SCRIPT_DISK_CACHE_TTL_SEC
+SEM_CACHE = CONFIG.SEM_CACHE
+SEM_CACHE_DIR = CONFIG.SEM_CACHE_DIR
+SEM_CACHE_MODEL = CONFIG.SEM_CACHE_MODEL
+SEM_CACHE_MIN_SIM = CONFIG.SEM_CACHE_MIN_SIM
+RETRY_DELAY_SEC = CONFIG.RETRY_DELAY_SEC
+GEMINI_QPM = CONFIG.GEMINI_QPM
+WEB_CONCURRENCY = CONFIG.WEB_CONCURRENCY
+BATCH_MAX_EPISODES = CONFIG.BATCH_MAX_EPISODES
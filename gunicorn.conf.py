@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for AuraCast (loaded automatically from the project root).
+gevent workers let one process serve many long-running generations at once;
+binds to $PORT when set (e.g. on Render).
+"""
+import os
+
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 200))
+
+
+def post_worker_init(worker):
+    """Start each worker's background work. post_fork would be too early: the gevent worker patches after it."""
+    from app import start_background
+
+    start_background()
@@ -1,30 +1,98 @@
 """
-Generate a two-host podcast script from extracted book text using Google Gemini.
+Generate a two-host podcast script from extracted book text using Google Gemini (google-genai SDK).
 Returns a list of {speaker, text} dicts. No Flask imports.
+Each generator has an async twin (agenerate_*) on the SDK's non-blocking client, so callers can gather many calls.
+astream_podcast_script / astream_episode_script stream the response and yield each turn as soon as it is complete.
+Scripts are cached by (model, generation settings, prompt): in memory per process, and on disk (diskcache,
+when installed) so identical requests from other workers or after a restart also skip Gemini.
 """
-import json
-import re
+import asyncio
+import copy
+import hashlib
+import logging
+import threading
 import time
-import warnings
+from collections.abc import AsyncIterator
+from contextlib import aclosing, asynccontextmanager, nullcontext
+from functools import lru_cache
 
-# Suppress deprecation warning for google.generativeai (still works; migrate to google.genai later)
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore", category=FutureWarning)
-    import google.generativeai as genai
+import native
+
+# orjson (C) when installed; stdlib json otherwise. _dumps returns compact, key-sorted UTF-8 bytes either way.
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    import json
+
+    _loads = json.loads
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = types = None
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# Optional semantic cache dependencies (SEM_CACHE=1)
+try:
+    import hnswlib
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    hnswlib = SentenceTransformer = None
 
 try:
     import config
     GEMINI_API_KEY = config.GEMINI_API_KEY
     GEMINI_MODEL = getattr(config, "GEMINI_MODEL", "gemini-1.5-flash")
     GEMINI_TIMEOUT = getattr(config, "GEMINI_TIMEOUT", 120)
+    PODCAST_MAX_OUT = int(getattr(config, "PODCAST_MAX_OUT", 1600))
+    EPISODE_MAX_OUT = int(getattr(config, "EPISODE_MAX_OUT", 900))
     GEMINI_MAX_INPUT_CHARS = getattr(config, "GEMINI_MAX_INPUT_CHARS", 30_000)
     RETRY_DELAY_SEC = getattr(config, "RETRY_DELAY_SEC", 30)
+    GEMINI_QPM = getattr(config, "GEMINI_QPM", 14)
+    WEB_CONCURRENCY = getattr(config, "WEB_CONCURRENCY", 2)
+    SCRIPT_CACHE_MAX = getattr(config, "SCRIPT_CACHE_MAX", 128)
+    SCRIPT_CACHE_TTL_SEC = getattr(config, "SCRIPT_CACHE_TTL_SEC", 24 * 3600)
+    SCRIPT_DISK_CACHE_DIR = getattr(config, "SCRIPT_DISK_CACHE_DIR", "")
+    SCRIPT_DISK_CACHE_TTL_SEC = getattr(config, "SCRIPT_DISK_CACHE_TTL_SEC", 7 * 24 * 3600)
+    SEM_CACHE = getattr(config, "SEM_CACHE", False)
+    SEM_CACHE_DIR = getattr(config, "SEM_CACHE_DIR", "")
+    SEM_CACHE_MODEL = getattr(config, "SEM_CACHE_MODEL", "all-MiniLM-L6-v2")
+    SEM_CACHE_MIN_SIM = getattr(config, "SEM_CACHE_MIN_SIM", 0.97)
+    BATCH_MAX_EPISODES = getattr(config, "BATCH_MAX_EPISODES", 4)
 except ImportError:
     GEMINI_API_KEY = ""
     GEMINI_MODEL = "gemini-1.5-flash"
     GEMINI_TIMEOUT = 120
+    PODCAST_MAX_OUT = 1600
+    EPISODE_MAX_OUT = 900
     GEMINI_MAX_INPUT_CHARS = 30_000
     RETRY_DELAY_SEC = 30
+    GEMINI_QPM = 14
+    WEB_CONCURRENCY = 2
+    SCRIPT_CACHE_MAX = 128
+    SCRIPT_CACHE_TTL_SEC = 24 * 3600
+    SCRIPT_DISK_CACHE_DIR = ""
+    SCRIPT_DISK_CACHE_TTL_SEC = 7 * 24 * 3600
+    SEM_CACHE = False
+    SEM_CACHE_DIR = ""
+    SEM_CACHE_MODEL = "all-MiniLM-L6-v2"
+    SEM_CACHE_MIN_SIM = 0.97
+    BATCH_MAX_EPISODES = 4
+
+logger = logging.getLogger(__name__)
 
 
 class ScriptGenerationError(Exception):
@@ -32,8 +100,9 @@ class ScriptGenerationError(Exception):
     pass
 
 
-# Fixed instruction template; book content is passed separately to avoid injection.
-INSTRUCTION = """You are a scriptwriter. Write a short podcast script based on the book excerpt below.
+# Fixed system instruction; book content is sent as the user message to avoid injection.
+# Static instructions are the model's system_instruction so Gemini can reuse the cached prefix across calls.
+INSTRUCTION = """You are a scriptwriter. Write a short podcast script based on the book excerpt the user sends.
 
 Rules:
 - Two hosts: "Host A" (female) and "Host B" (male).
@@ -42,12 +111,10 @@ Rules:
 - Each element: {"speaker": "Host A" or "Host B", "text": "one line of dialogue"}.
 - Use "Host A" and "Host B" exactly. Keep each "text" to 1-3 sentences.
 - Aim for about 8-16 dialogue turns total.
-
-Book excerpt:
 """
 
 # Shorter episode script (5-8 turns) for one chunk; optional user focus prompt.
-EPISODE_INSTRUCTION_TEMPLATE = """You are a scriptwriter. Write a short podcast segment based on the book excerpt below.
+EPISODE_INSTRUCTION_TEMPLATE = """You are a scriptwriter. Write a short podcast segment based on the book excerpt the user sends.
 
 Rules:
 - Two hosts: "Host A" (female) and "Host B" (male).
@@ -57,216 +124,1096 @@ Rules:
 - Each element: {{"speaker": "Host A" or "Host B", "text": "one line of dialogue"}}.
 - Use "Host A" and "Host B" exactly. Keep each "text" to 1-3 sentences.
 - Aim for 5-8 dialogue turns total.
+"""
+
+
+# Several chunks in one prompt; the model returns {"episodes": [...]} with one script array per excerpt.
+BATCH_EPISODE_INSTRUCTION_TEMPLATE = """You are a scriptwriter. Write a short podcast segment for EACH of the {count} book excerpts the user sends.
 
-Book excerpt:
+Rules:
+- Two hosts: "Host A" (female) and "Host B" (male).
+- Tone: warm, engaging, conversational. Summarize each excerpt's key points.
+{focus_line}
+- Output ONLY a valid JSON object {{"episodes": [...]}} whose "episodes" array has exactly {count} elements, one per excerpt, in order. No markdown, no code fence, no other text.
+- Each element of "episodes" is a JSON array of dialogue turns: {{"speaker": "Host A" or "Host B", "text": "one line of dialogue"}}.
+- Use "Host A" and "Host B" exactly. Keep each "text" to 1-3 sentences.
+- Aim for 5-8 dialogue turns per excerpt.
+- Each excerpt starts with a line like ---EPISODE 1---.
 """
 
 
-def _parse_script_json(raw: str) -> list[dict]:
-    """Parse and validate script JSON from model output. Strips code fences if present."""
+def _load_json(raw: str):
+    """Decode JSON from model output. Strips code fences if present."""
     raw = raw.strip()
-    # Remove optional markdown code block
+    # Remove an optional markdown code block (fixed literals, no regex); the closing fence may be missing
+    # when the output was truncated
     if raw.startswith("```"):
-        raw = re.sub(r"^```(?:json)?\s*", "", raw)
-        raw = re.sub(r"\s*```\s*$", "", raw)
+        raw = raw[3:]
+        if raw.startswith("json"):
+            raw = raw[4:]
+        raw = raw.lstrip()
+        if raw.endswith("```"):
+            raw = raw[:-3]
+        raw = raw.rstrip()
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError as e:
+        return _loads(raw)
+    except ValueError as e:
+        # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
         raise ScriptGenerationError("Model did not return valid JSON.") from e
+
+
+def _parse_script_json(raw: str) -> list[dict]:
+    """Parse and validate script JSON from model output. Strips code fences if present."""
+    return _validate_script(_load_json(raw))
+
+
+def _validate_script(data) -> list[dict]:
+    """Validate a decoded script array and normalize speakers/text in place."""
     if not isinstance(data, list):
         raise ScriptGenerationError("Script must be a JSON array.")
     for i, item in enumerate(data):
-        if not isinstance(item, dict) or "speaker" not in item or "text" not in item:
-            raise ScriptGenerationError(f"Script item {i} must have 'speaker' and 'text'.")
-        if item["speaker"] not in ("Host A", "Host B"):
-            item["speaker"] = "Host A" if "female" in str(item.get("speaker", "")).lower() else "Host B"
-        item["text"] = str(item["text"]).strip()
-        if not item["text"]:
-            raise ScriptGenerationError(f"Script item {i} has empty text.")
+        _validate_item(i, item)
     return data
 
 
+def _validate_item(i: int, item) -> dict:
+    """Validate script item i and normalize its speaker/text in place."""
+    try:
+        speaker = item["speaker"]
+        text = item["text"]
+    except (TypeError, KeyError, IndexError) as e:
+        raise ScriptGenerationError(f"Script item {i} must have 'speaker' and 'text'.") from e
+    if speaker not in ("Host A", "Host B"):
+        item["speaker"] = "Host A" if isinstance(speaker, str) and "female" in speaker.lower() else "Host B"
+    text = item["text"] = str(text).strip()
+    if not text:
+        raise ScriptGenerationError(f"Script item {i} has empty text.")
+    return item
+
+
+class _ScriptStreamParser:
+    """
+    Incremental parser for a streamed script array. feed() each piece of response text and get back the turns
+    ({...} objects directly inside the array) whose closing brace it contained. A bracket counter tracks object
+    depth outside JSON strings (honouring escapes); anything before the first "[" (e.g. a ```json fence) and after
+    the closing "]" is skipped. An array element that is not an object raises ScriptGenerationError.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._count = 0  # turns returned so far
+        self._partial = []  # pieces of the object still open at the end of the last feed
+
+    def feed(self, text: str) -> list:
+        done = []
+        i = 0
+        if self._closed:
+            return done
+        if not self._started:
+            i = text.find("[")
+            if i < 0:
+                return done
+            self._started = True
+            i += 1
+        start = i if self._depth else None
+        for j in range(i, len(text)):
+            ch = text[j]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._depth:
+                if ch == '"':
+                    self._in_string = True
+                elif ch == "{":
+                    self._depth += 1
+                elif ch == "}":
+                    self._depth -= 1
+                    if not self._depth:
+                        self._partial.append(text[start : j + 1])
+                        try:
+                            done.append(_loads("".join(self._partial)))
+                        except ValueError as e:
+                            raise ScriptGenerationError("Model did not return valid JSON.") from e
+                        self._count += 1
+                        self._partial.clear()
+                        start = None
+            elif ch == "{":
+                start = j
+                self._depth = 1
+            elif ch == "]":
+                self._closed = True
+                break
+            elif not (ch == "," or ch.isspace()):
+                raise ScriptGenerationError(f"Script item {self._count} must have 'speaker' and 'text'.")
+        if start is not None:
+            self._partial.append(text[start:])
+        return done
+
+    def pending(self) -> bool:
+        """True while a turn is still open (the stream stopped mid-object)."""
+        return self._depth > 0
+
+    def complete(self) -> bool:
+        """True once the array's closing "]" has been seen."""
+        return self._closed
+
+
+def _is_truncated(raw: str) -> bool:
+    """True when model output looks cut off at max_output_tokens: trailing comma or unclosed brackets."""
+    raw = raw.rstrip()
+    if raw.endswith("```"):
+        raw = raw[:-3].rstrip()
+    return raw.endswith(",") or raw.count("[") > raw.count("]") or raw.count("{") > raw.count("}")
+
+
+def _doubled(generation: dict) -> dict:
+    """generation with max_output_tokens doubled, for retrying a truncated script."""
+    return {**generation, "max_output_tokens": 2 * generation["max_output_tokens"]}
+
+
+# Generation settings per call type; part of the script cache key
+_PODCAST_GENERATION = {"temperature": 0.7, "max_output_tokens": PODCAST_MAX_OUT}
+_EPISODE_GENERATION = {"temperature": 0.7, "max_output_tokens": EPISODE_MAX_OUT}
+_BATCH_GENERATION = {"temperature": 0.7, "max_output_tokens": 8192}
+_INTERRUPT_GENERATION = {"temperature": 0.6, "max_output_tokens": 512}
+
+# In-memory script cache: key -> {"script": list[dict], "ts": float, "hits": int}. Evict by TTL, then v-LRU.
+_SCRIPT_CACHE = {}
+_SCRIPT_CACHE_LOCK = threading.Lock()
+
+
+def _script_cache_key(model: str, generation: dict, *parts: str) -> str:
+    """
+    Cache key for one Gemini call: SHA-256 of the model name and generation settings (sorted JSON) followed by
+    the prompt parts sent (same as hashing their concatenation).
+    """
+    h = hashlib.sha256(_dumps({"model": model, **generation}))
+    for part in parts:
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _excerpt(text: str, what: str) -> str:
+    """Cap text at GEMINI_MAX_INPUT_CHARS, logging when characters are dropped."""
+    if len(text) > GEMINI_MAX_INPUT_CHARS:
+        logger.warning("%s truncated from %d to %d characters for Gemini", what, len(text), GEMINI_MAX_INPUT_CHARS)
+        return text[:GEMINI_MAX_INPUT_CHARS]
+    return text
+
+
+def _script_cache_evict() -> None:
+    """
+    Remove expired entries, then while over SCRIPT_CACHE_MAX evict from the least recently used 10%
+    the entry with the fewest hits (v-LRU). Caller holds the lock.
+    """
+    now = time.time()
+    expired = [key for key, entry in _SCRIPT_CACHE.items() if (now - entry["ts"]) > SCRIPT_CACHE_TTL_SEC]
+    for key in expired:
+        del _SCRIPT_CACHE[key]
+    while len(_SCRIPT_CACHE) > SCRIPT_CACHE_MAX:
+        by_ts = sorted(_SCRIPT_CACHE.items(), key=lambda x: x[1]["ts"])
+        candidates = by_ts[: max(1, len(by_ts) // 10)]
+        # Fewest hits == lowest log(hits + 1) score; min() keeps the oldest on ties
+        victim, _ = min(candidates, key=lambda x: x[1]["hits"])
+        del _SCRIPT_CACHE[victim]
+
+
+@lru_cache(maxsize=1)
+def _disk_cache():
+    """Open the persistent script cache once per process; None when diskcache is missing or the cache is disabled."""
+    if diskcache is None or not SCRIPT_DISK_CACHE_DIR:
+        return None
+    try:
+        return diskcache.Cache(SCRIPT_DISK_CACHE_DIR)
+    except Exception:
+        logger.warning("Script disk cache unavailable at %s", SCRIPT_DISK_CACHE_DIR, exc_info=True)
+        return None
+
+
+def _disk_cache_get(key: str) -> list[dict] | None:
+    """Return the script stored on disk for key, or None (a disk error counts as a miss)."""
+    cache = _disk_cache()
+    if cache is None:
+        return None
+    try:
+        raw = cache.get(key)
+        return _loads(raw) if raw is not None else None
+    except Exception:
+        logger.warning("Script disk cache read failed", exc_info=True)
+        return None
+
+
+def _disk_cache_set(key: str, script: list[dict]) -> None:
+    """Store script on disk for SCRIPT_DISK_CACHE_TTL_SEC (best effort)."""
+    cache = _disk_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, _dumps(script), expire=SCRIPT_DISK_CACHE_TTL_SEC)
+    except Exception:
+        logger.warning("Script disk cache write failed", exc_info=True)
+
+
+def _script_cache_get(key: str) -> list[dict] | None:
+    """
+    Return a copy of the cached script for key, or None if missing/expired. Refreshes recency on hit.
+    Falls back to the disk cache and promotes disk hits into memory.
+    """
+    with _SCRIPT_CACHE_LOCK:
+        entry = _SCRIPT_CACHE.get(key)
+        if entry is not None:
+            now = time.time()
+            if (now - entry["ts"]) <= SCRIPT_CACHE_TTL_SEC:
+                entry["hits"] += 1
+                entry["ts"] = now
+                return copy.deepcopy(entry["script"])
+            del _SCRIPT_CACHE[key]
+    script = _disk_cache_get(key)
+    if script is not None:
+        with _SCRIPT_CACHE_LOCK:
+            _SCRIPT_CACHE[key] = {"script": copy.deepcopy(script), "ts": time.time(), "hits": 0}
+            _script_cache_evict()
+    return script
+
+
+def _script_cache_set(key: str, script: list[dict]) -> None:
+    """Store a copy of script under key in memory and on disk; evicts if over capacity."""
+    with _SCRIPT_CACHE_LOCK:
+        _SCRIPT_CACHE[key] = {"script": copy.deepcopy(script), "ts": time.time(), "hits": 0}
+        _script_cache_evict()
+    _disk_cache_set(key, script)
+
+
+def _new_client():
+    """Build a google-genai Client with the API key and GEMINI_TIMEOUT (the SDK takes milliseconds)."""
+    if genai is None:
+        raise ScriptGenerationError("google-genai is not installed.")
+    http_options = types.HttpOptions(timeout=GEMINI_TIMEOUT * 1000) if GEMINI_TIMEOUT else None
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+
+
+# Process-wide sync Client: its httpx pool keeps connections alive across all models and requests,
+# and plain sockets yield under gevent. Built at import when the key is set, else on first use.
+_CLIENT = _new_client() if GEMINI_API_KEY and genai is not None else None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _get_client():
+    """Return the shared sync Client (created once; concurrent first calls do not build duplicate pools)."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = _new_client()
+    return _CLIENT
+
+
+@asynccontextmanager
+async def _async_client():
+    """
+    Async client (Client.aio) closed on exit. An httpx AsyncClient's connection pool belongs to the loop it runs on
+    and jobs run each in their own asyncio.run() loop, so it cannot be process-wide: one is opened per script
+    generation and passed to every request it makes (first attempt, truncation retry, rate-limit retries).
+    """
+    client = _new_client().aio
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+def _client_scope(client):
+    """async with target for a Gemini call: the caller's client (left open), else a new one closed after the call."""
+    return nullcontext(client) if client is not None else _async_client()
+
+
+@lru_cache(maxsize=32)
+def _content_config(system_instruction: str, temperature: float, max_output_tokens: int):
+    """GenerateContentConfig per (system instruction, settings); reused across requests."""
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+    )
+
+
 # Retry settings for rate-limit and transient errors (RETRY_DELAY_SEC from config, default 30)
 MAX_RETRIES = 2
 
 
-def generate_podcast_script(extracted_text: str, *, model: str | None = None) -> list[dict]:
+def _is_rate_limit(e: Exception) -> bool:
+    """True for quota / 429 errors (worth waiting and retrying)."""
+    err_msg = str(e).lower()
+    return "quota" in err_msg or "rate" in err_msg or "429" in err_msg
+
+
+def _is_timeout(e: Exception) -> bool:
+    """True for request timeouts (httpx raises ReadTimeout etc. with "timed out" messages)."""
+    err_msg = str(e).lower()
+    return "timeout" in type(e).__name__.lower() or "timeout" in err_msg or "timed out" in err_msg or "deadline" in err_msg
+
+
+class _TokenBucket:
     """
-    Call Gemini to generate a podcast script. Returns list of {speaker, text}.
-    Uses extracted_text as content only; instructions are fixed.
-    Retries up to MAX_RETRIES on rate-limit or transient errors.
+    Token bucket shared by sync and async callers: holds up to rate tokens, refilled at rate per period seconds.
+    acquire() / aacquire() take one token, sleeping until it is due; a caller reserves its token before waiting,
+    so waiters are served in arrival order and a burst is spread out instead of running into 429s. A waiter that
+    is cancelled gives its token back.
     """
-    if not GEMINI_API_KEY:
-        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
-    model = model or GEMINI_MODEL
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Cap input size to stay within free-tier token limits (fewer tokens = fewer rate limits)
-    prompt = INSTRUCTION + extracted_text[:GEMINI_MAX_INPUT_CHARS]
 
-    last_error = None
-    for attempt in range(MAX_RETRIES + 1):
+    def __init__(self, rate: float, period: float = 60.0):
+        self._capacity = max(1.0, float(rate))
+        self._per_sec = rate / period
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (the balance may go negative) and return the seconds until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._per_sec)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self._per_sec if self._tokens < 0 else 0.0
+
+    def _refund(self) -> None:
+        """Return a reserved token whose caller stopped waiting, so later callers are not delayed by it."""
+        with self._lock:
+            self._tokens += 1
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            try:
+                time.sleep(wait)
+            except BaseException:
+                # e.g. a gevent Timeout or KeyboardInterrupt while waiting
+                self._refund()
+                raise
+
+    async def aacquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
+
+
+# Every Gemini request (including retries) takes a token; None when GEMINI_QPM is 0. The budget is per app, so each
+# of the WEB_CONCURRENCY worker processes gets its share (gunicorn.conf.py starts 2 by default)
+_GEMINI_LIMITER = _TokenBucket(GEMINI_QPM / max(1, WEB_CONCURRENCY)) if GEMINI_QPM > 0 else None
+
+
+def _generate(model: str, instruction: str, prompt: str, generation: dict, to_error, retries: int = MAX_RETRIES) -> str:
+    """
+    One Gemini call; returns the response text. Each attempt waits for a GEMINI_QPM token first; rate limits that
+    still happen wait RETRY_DELAY_SEC and retry up to retries times; other failures are mapped to a
+    ScriptGenerationError by to_error.
+    """
+    config = _content_config(instruction, **generation)
+    for attempt in range(retries + 1):
+        if _GEMINI_LIMITER is not None:
+            _GEMINI_LIMITER.acquire()
         try:
-            generative_model = genai.GenerativeModel(model)
-            response = generative_model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=8192,
-                ),
-                request_options={"timeout": GEMINI_TIMEOUT} if GEMINI_TIMEOUT else {},
-            )
+            response = _get_client().models.generate_content(model=model, contents=prompt, config=config)
         except Exception as e:
-            last_error = e
-            err_msg = str(e).lower()
-            is_rate_limit = "quota" in err_msg or "rate" in err_msg or "429" in err_msg
-            if is_rate_limit and attempt < MAX_RETRIES:
+            if _is_rate_limit(e) and attempt < retries:
                 time.sleep(RETRY_DELAY_SEC)
                 continue
-            if "timeout" in err_msg or "deadline" in err_msg:
-                raise ScriptGenerationError("Request timed out. Try a shorter book or try again.") from e
-            if is_rate_limit:
-                raise ScriptGenerationError(
-                    "Free tier rate limit reached. Wait 1–2 minutes, then try again. Use one episode at a time; in .env set GEMINI_MAX_INPUT_CHARS=15000 to use fewer tokens."
-                ) from e
-            if "length" in err_msg or "context" in err_msg:
-                raise ScriptGenerationError("Summary too long. Try a shorter book or reduce input.") from e
-            raise ScriptGenerationError("Failed to generate script. Please try again.") from e
-
+            raise to_error(e) from e
         if not response or not response.text:
             raise ScriptGenerationError("Model returned no text.")
+        return response.text
 
-        return _parse_script_json(response.text)
 
-    raise ScriptGenerationError(
-        "Free tier rate limit reached. Wait 1–2 minutes, then try again."
-    ) from last_error
+async def _agenerate(
+    model: str, instruction: str, prompt: str, generation: dict, to_error, retries: int = MAX_RETRIES, client=None
+) -> str:
+    """Async _generate on client (or one closed when the call ends); the retry wait does not block the loop."""
+    config = _content_config(instruction, **generation)
+    async with _client_scope(client) as client:
+        for attempt in range(retries + 1):
+            if _GEMINI_LIMITER is not None:
+                await _GEMINI_LIMITER.aacquire()
+            try:
+                response = await client.models.generate_content(model=model, contents=prompt, config=config)
+            except Exception as e:
+                if _is_rate_limit(e) and attempt < retries:
+                    await asyncio.sleep(RETRY_DELAY_SEC)
+                    continue
+                raise to_error(e) from e
+            if not response or not response.text:
+                raise ScriptGenerationError("Model returned no text.")
+            return response.text
 
 
-def generate_episode_script(chunk_text: str, user_prompt: str = "", *, model: str | None = None) -> list[dict]:
+async def _astream_text(
+    model: str, instruction: str, prompt: str, generation: dict, to_error, retries: int = MAX_RETRIES, client=None
+) -> AsyncIterator[str]:
     """
-    Generate a short (5-8 turn) two-host script for one chunk. Optional user_prompt focuses the hosts.
-    Same retry/parse as generate_podcast_script.
+    Streaming _agenerate: yields the response text as it arrives. Rate limits raised when the stream is opened
+    are retried like _agenerate; a failure after text has been yielded is mapped by to_error without retrying.
     """
-    if not GEMINI_API_KEY:
-        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
-    focus_line = ""
-    if user_prompt and user_prompt.strip():
-        focus_line = "- The hosts should focus on: " + user_prompt.strip() + "\n"
-    instruction = EPISODE_INSTRUCTION_TEMPLATE.format(focus_line=focus_line)
-    prompt = instruction + chunk_text[:GEMINI_MAX_INPUT_CHARS]
-    model = model or GEMINI_MODEL
-    genai.configure(api_key=GEMINI_API_KEY)
-
-    last_error = None
-    for attempt in range(MAX_RETRIES + 1):
+    config = _content_config(instruction, **generation)
+    async with _client_scope(client) as client:
+        for attempt in range(retries + 1):
+            if _GEMINI_LIMITER is not None:
+                await _GEMINI_LIMITER.aacquire()
+            try:
+                stream = await client.models.generate_content_stream(model=model, contents=prompt, config=config)
+                break
+            except Exception as e:
+                if _is_rate_limit(e) and attempt < retries:
+                    await asyncio.sleep(RETRY_DELAY_SEC)
+                    continue
+                raise to_error(e) from e
         try:
-            generative_model = genai.GenerativeModel(model)
-            response = generative_model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=4096,
-                ),
-                request_options={"timeout": GEMINI_TIMEOUT} if GEMINI_TIMEOUT else {},
-            )
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
         except Exception as e:
-            last_error = e
-            err_msg = str(e).lower()
-            is_rate_limit = "quota" in err_msg or "rate" in err_msg or "429" in err_msg
-            if is_rate_limit and attempt < MAX_RETRIES:
-                time.sleep(RETRY_DELAY_SEC)
-                continue
-            if "timeout" in err_msg or "deadline" in err_msg:
-                raise ScriptGenerationError("Request timed out. Try again.") from e
-            if is_rate_limit:
-                raise ScriptGenerationError(
-                    "Free tier rate limit reached. Wait 1–2 minutes, then try one episode at a time. In .env you can set GEMINI_MAX_INPUT_CHARS=15000 to use fewer tokens."
-                ) from e
-            if "length" in err_msg or "context" in err_msg:
-                raise ScriptGenerationError("Summary too long. Try again.") from e
-            if "key" in err_msg or "api_key" in err_msg or "invalid" in err_msg and "api" in err_msg:
-                raise ScriptGenerationError(
-                    "Gemini API key missing or invalid. Check GEMINI_API_KEY in .env."
-                ) from e
-            if "blocked" in err_msg or "safety" in err_msg:
-                raise ScriptGenerationError(
-                    "Content was blocked. Try a different focus prompt or chapter."
-                ) from e
-            raise ScriptGenerationError(
-                "Failed to generate script. Please try again. (Tip: wait a minute if you hit rate limits.)"
-            ) from e
+            raise to_error(e) from e
 
-        if not response or not response.text:
+
+async def _astream_script(
+    model: str, instruction: str, prompt: str, generation: dict, to_error
+) -> AsyncIterator[dict | None]:
+    """
+    Yield each validated turn of a streamed script; falls back to parsing the whole text if none was found.
+    A stream cut off before the array closes (usually at max_output_tokens) is regenerated in full with twice the
+    cap: None is yielded first, telling the consumer to discard the turns it has, then every turn of the retry.
+    If the retry is cut off too (or has no turns), ScriptGenerationError is raised after the turns yielded, so
+    callers never take a partial script for a complete one. Every request made for the script goes through one
+    async client.
+    """
+    async with _async_client() as client:
+        parser = _ScriptStreamParser()
+        pieces = []
+        count = 0
+        async with aclosing(_astream_text(model, instruction, prompt, generation, to_error, client=client)) as texts:
+            async for text in texts:
+                pieces.append(text)
+                for item in parser.feed(text):
+                    yield _validate_item(count, item)
+                    count += 1
+        if not pieces:
             raise ScriptGenerationError("Model returned no text.")
+        if not count:
+            # Not an array of objects: report it the way the non-streaming path would (retrying a truncated reply)
+            raw = "".join(pieces)
+            try:
+                script = _parse_script_json(raw)
+            except ScriptGenerationError:
+                if not _is_truncated(raw):
+                    raise
+                logger.info("Script truncated at max_output_tokens=%d; retrying at 2x", generation["max_output_tokens"])
+                raw = await _agenerate(model, instruction, prompt, _doubled(generation), to_error, client=client)
+                script = _parse_script_json(raw)
+            for item in script:
+                yield item
+            return
+        if parser.complete():
+            return
+        # A retry's turns need not line up with the first reply's, so the script restarts from the retry alone
+        logger.info("Streamed script cut off after %d turns at max_output_tokens=%d; regenerating at 2x",
+                    count, generation["max_output_tokens"])
+        yield None
+        parser = _ScriptStreamParser()
+        count = 0
+        retry = _astream_text(model, instruction, prompt, _doubled(generation), to_error, client=client)
+        async with aclosing(retry) as texts:
+            async for text in texts:
+                for item in parser.feed(text):
+                    yield _validate_item(count, item)
+                    count += 1
+        if not parser.complete():
+            logger.warning("Streamed script cut off again after %d turns", count)
+            raise ScriptGenerationError("Model did not return valid JSON.")
+        if not count:
+            raise ScriptGenerationError("Model returned an empty script.")
+
+
+def _generate_script(model: str, instruction: str, prompt: str, generation: dict, to_error) -> list[dict]:
+    """_generate and parse a script; a reply cut off at max_output_tokens is retried once with twice the cap."""
+    raw = _generate(model, instruction, prompt, generation, to_error)
+    try:
+        return _parse_script_json(raw)
+    except ScriptGenerationError:
+        if not _is_truncated(raw):
+            raise
+    logger.info("Script truncated at max_output_tokens=%d; retrying at 2x", generation["max_output_tokens"])
+    return _parse_script_json(_generate(model, instruction, prompt, _doubled(generation), to_error))
+
+
+async def _agenerate_script(model: str, instruction: str, prompt: str, generation: dict, to_error) -> list[dict]:
+    """Async _generate_script; both attempts share one client."""
+    async with _async_client() as client:
+        raw = await _agenerate(model, instruction, prompt, generation, to_error, client=client)
         try:
-            return _parse_script_json(response.text)
+            return _parse_script_json(raw)
         except ScriptGenerationError:
-            raise
-        except Exception as e:
-            raise ScriptGenerationError(
-                "Model returned an invalid format. Please try again."
-            ) from e
+            if not _is_truncated(raw):
+                raise
+        logger.info("Script truncated at max_output_tokens=%d; retrying at 2x", generation["max_output_tokens"])
+        return _parse_script_json(
+            await _agenerate(model, instruction, prompt, _doubled(generation), to_error, client=client)
+        )
+
+
+def _podcast_error(e: Exception) -> ScriptGenerationError:
+    """Map a Gemini exception from a full-podcast request to a user-facing ScriptGenerationError."""
+    err_msg = str(e).lower()
+    if _is_timeout(e):
+        return ScriptGenerationError("Request timed out. Try a shorter book or try again.")
+    if _is_rate_limit(e):
+        return ScriptGenerationError(
+            "Free tier rate limit reached. Wait 1–2 minutes, then try again. Use one episode at a time; in .env set GEMINI_MAX_INPUT_CHARS=15000 to use fewer tokens."
+        )
+    if "length" in err_msg or "context" in err_msg:
+        return ScriptGenerationError("Summary too long. Try a shorter book or reduce input.")
+    return ScriptGenerationError("Failed to generate script. Please try again.")
+
 
-    raise ScriptGenerationError(
-        "Free tier rate limit reached. Wait 1–2 minutes, then try one episode at a time."
-    ) from last_error
+class SemanticCache:
+    """
+    Near-duplicate cache for full-podcast scripts. embed_chars characters from the middle of the book text are
+    embedded (normalized, so cosine == dot product) and looked up in an in-memory hnswlib index; a neighbour with
+    cosine similarity >= min_sim, the same scope (model, settings, instruction) and a text length within length_tol
+    returns its stored script. The window skips the opening, where books from one publisher share front matter.
+    Vectors and scripts are persisted in a diskcache store; the index is rebuilt from it when the process starts,
+    so entries written later by other workers are seen after their next restart.
+    """
 
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        min_sim: float,
+        *,
+        embed_chars: int = 2000,
+        length_tol: float = 0.05,
+        capacity: int = 1024,
+    ):
+        self.min_sim = min_sim
+        self.embed_chars = embed_chars
+        self.length_tol = length_tol
+        self._embedder = SentenceTransformer(model_name)
+        self._store = diskcache.Cache(path)
+        self._index = hnswlib.Index(space="cosine", dim=self._embedder.get_sentence_embedding_dimension())
+        self._index.init_index(max_elements=capacity, ef_construction=200, M=16)
+        self._keys = []  # hnswlib label -> store key
+        self._lock = threading.Lock()
+        for key in self._store.iterkeys():
+            entry = self._store.get(key)
+            # Entries without a length were embedded from the opening of the text and are not comparable
+            if entry is not None and "length" in entry:
+                self._add(key, entry["vector"])
 
-INTERRUPT_INSTRUCTION_TEMPLATE = """The user asked the podcast hosts: "{question}"
+    def _embed(self, text: str):
+        """Embed the middle embed_chars of text. CPU-bound, so it runs off the gevent hub (see native.call)."""
+        start = max(0, (len(text) - self.embed_chars) // 2)
+        window = text[start : start + self.embed_chars]
+        return native.call(self._embedder.encode, window, normalize_embeddings=True)
 
-Based on the following podcast script (what the hosts just said), have Host A and Host B each give a brief 1-2 sentence answer. Stay in character and address the question.
+    def _same_length(self, entry: dict, length: int) -> bool:
+        return abs(entry["length"] - length) <= self.length_tol * max(entry["length"], length)
 
-Output ONLY a valid JSON array of exactly 2 elements: [{{"speaker": "Host A", "text": "..."}}, {{"speaker": "Host B", "text": "..."}}]. No markdown, no code fence.
+    def _add(self, key: str, vector) -> None:
+        """Index vector under key (caller holds the lock, or is __init__). Grows the index when full."""
+        if len(self._keys) >= self._index.get_max_elements():
+            self._index.resize_index(2 * self._index.get_max_elements())
+        self._index.add_items([vector], [len(self._keys)])
+        self._keys.append(key)
+
+    def get(self, scope: str, text: str) -> list[dict] | None:
+        """Return the script of the most similar stored text in scope, or None."""
+        vector = self._embed(text)
+        with self._lock:
+            if not self._keys:
+                return None
+            labels, distances = self._index.knn_query([vector], k=min(4, len(self._keys)))
+            candidates = [self._keys[label] for label, distance in zip(labels[0], distances[0])
+                          if 1.0 - distance >= self.min_sim]
+        for key in candidates:
+            entry = self._store.get(key)
+            if entry is not None and entry["scope"] == scope and self._same_length(entry, len(text)):
+                return entry["script"]
+        return None
+
+    def set(self, scope: str, key: str, text: str, script: list[dict]) -> None:
+        """Store script for text under key (the exact-match cache key) for SCRIPT_DISK_CACHE_TTL_SEC."""
+        vector = self._embed(text)
+        entry = {"scope": scope, "vector": vector, "length": len(text), "script": script}
+        self._store.set(key, entry, expire=SCRIPT_DISK_CACHE_TTL_SEC)
+        with self._lock:
+            self._add(key, vector)
+
+
+# The process's SemanticCache once warm_semantic_cache has built it; requests never build it themselves
+_SEMANTIC_CACHE: SemanticCache | None = None
+_SEMANTIC_CACHE_LOCK = threading.Lock()
+
+
+def warm_semantic_cache() -> None:
+    """
+    Build the SemanticCache when SEM_CACHE is on and its dependencies are installed: load (or download) the
+    embedding model and rebuild the index from disk. Slow and CPU-bound, so the server entry points run it once per
+    process on a native thread at startup; until it finishes every lookup is a miss.
+    """
+    global _SEMANTIC_CACHE
+    if not SEM_CACHE or not SEM_CACHE_DIR:
+        return
+    if hnswlib is None or SentenceTransformer is None or diskcache is None:
+        logger.warning("SEM_CACHE is set but sentence-transformers, hnswlib or diskcache is not installed")
+        return
+    with _SEMANTIC_CACHE_LOCK:
+        if _SEMANTIC_CACHE is not None:
+            return
+        try:
+            _SEMANTIC_CACHE = SemanticCache(SEM_CACHE_DIR, SEM_CACHE_MODEL, SEM_CACHE_MIN_SIM)
+        except Exception:
+            logger.warning("Semantic cache unavailable", exc_info=True)
+
+
+def _semantic_cache() -> SemanticCache | None:
+    """The warmed SemanticCache, or None (off, unavailable, or still loading)."""
+    return _SEMANTIC_CACHE
+
+
+def _semantic_get(model: str, prompt: str, cache_key: str) -> list[dict] | None:
+    """Semantic-cache lookup for a podcast prompt; a hit is also stored under the exact key. Errors count as a miss."""
+    semantic = _semantic_cache()
+    if semantic is None:
+        return None
+    try:
+        script = semantic.get(_script_cache_key(model, _PODCAST_GENERATION, INSTRUCTION), prompt)
+    except Exception:
+        logger.warning("Semantic cache lookup failed", exc_info=True)
+        return None
+    if script is not None:
+        _script_cache_set(cache_key, script)
+    return script
+
+
+def _semantic_set(model: str, prompt: str, cache_key: str, script: list[dict]) -> None:
+    """Add a freshly generated podcast script to the semantic cache (best effort)."""
+    semantic = _semantic_cache()
+    if semantic is None:
+        return
+    try:
+        semantic.set(_script_cache_key(model, _PODCAST_GENERATION, INSTRUCTION), cache_key, prompt, script)
+    except Exception:
+        logger.warning("Semantic cache write failed", exc_info=True)
+
+
+def _podcast_request(extracted_text: str, model: str | None) -> tuple[str, str, str]:
+    """(model, prompt, cache_key) for a full-podcast request."""
+    model = model or GEMINI_MODEL
+    # Cap input size to stay within free-tier token limits (fewer tokens = fewer rate limits).
+    # The excerpt is the whole user message (INSTRUCTION is the system instruction), so it is never copied.
+    prompt = _excerpt(extracted_text, "Book text")
+    return model, prompt, _script_cache_key(model, _PODCAST_GENERATION, INSTRUCTION, prompt)
+
+
+def generate_podcast_script(extracted_text: str, *, model: str | None = None, cache: bool = True) -> list[dict]:
+    """
+    Call Gemini to generate a podcast script. Returns list of {speaker, text}.
+    Uses extracted_text as content only; instructions are fixed.
+    Retries up to MAX_RETRIES on rate-limit or transient errors, and once at twice PODCAST_MAX_OUT when the reply was
+    cut off. Cached by (model, settings, prompt) unless cache=False; with SEM_CACHE=1 a near-duplicate book also
+    reuses an earlier script. Logs when the text is truncated.
+    """
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, prompt, cache_key = _podcast_request(extracted_text, model)
+    cached = (_script_cache_get(cache_key) or _semantic_get(model, prompt, cache_key)) if cache else None
+    if cached is not None:
+        return cached
+    script = _generate_script(model, INSTRUCTION, prompt, _PODCAST_GENERATION, _podcast_error)
+    if cache:
+        _script_cache_set(cache_key, script)
+        _semantic_set(model, prompt, cache_key, script)
+    return script
+
+
+async def agenerate_podcast_script(extracted_text: str, *, model: str | None = None, cache: bool = True) -> list[dict]:
+    """Async generate_podcast_script (same prompt, retries and cache)."""
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, prompt, cache_key = _podcast_request(extracted_text, model)
+    cached = (_script_cache_get(cache_key) or _semantic_get(model, prompt, cache_key)) if cache else None
+    if cached is not None:
+        return cached
+    script = await _agenerate_script(model, INSTRUCTION, prompt, _PODCAST_GENERATION, _podcast_error)
+    if cache:
+        _script_cache_set(cache_key, script)
+        _semantic_set(model, prompt, cache_key, script)
+    return script
+
+
+async def astream_podcast_script(
+    extracted_text: str, *, model: str | None = None, cache: bool = True
+) -> AsyncIterator[dict | None]:
+    """
+    Streaming agenerate_podcast_script: yields each {speaker, text} turn as soon as Gemini has finished it, so TTS
+    can start before the whole script is written. A None item means the reply was cut off and is being regenerated:
+    drop every turn received so far. The script is cached only once a stream has delivered all of it; a stream
+    that breaks off raises ScriptGenerationError after the turns it did yield.
+    """
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, prompt, cache_key = _podcast_request(extracted_text, model)
+    cached = (_script_cache_get(cache_key) or _semantic_get(model, prompt, cache_key)) if cache else None
+    if cached is not None:
+        for item in cached:
+            yield item
+        return
+    script = []
+    async for item in _astream_script(model, INSTRUCTION, prompt, _PODCAST_GENERATION, _podcast_error):
+        if item is None:
+            script.clear()
+        else:
+            script.append(item)
+        yield item
+    if cache:
+        _script_cache_set(cache_key, script)
+        _semantic_set(model, prompt, cache_key, script)
+
+
+@lru_cache(maxsize=64)
+def _episode_instruction(user_prompt: str) -> str:
+    """System instruction for one episode, formatted once per focus prompt."""
+    return EPISODE_INSTRUCTION_TEMPLATE.format(focus_line=_focus_line(user_prompt))
+
+
+def _focus_line(user_prompt: str) -> str:
+    """Instruction line for the optional user focus prompt ("" when not given)."""
+    if user_prompt and user_prompt.strip():
+        return "- The hosts should focus on: " + user_prompt.strip() + "\n"
+    return ""
+
+
+def _episode_error(e: Exception) -> ScriptGenerationError:
+    """Map a Gemini exception from an episode request to a user-facing ScriptGenerationError."""
+    err_msg = str(e).lower()
+    if _is_timeout(e):
+        return ScriptGenerationError("Request timed out. Try again.")
+    if _is_rate_limit(e):
+        return ScriptGenerationError(
+            "Free tier rate limit reached. Wait 1–2 minutes, then try one episode at a time. In .env you can set GEMINI_MAX_INPUT_CHARS=15000 to use fewer tokens."
+        )
+    if "length" in err_msg or "context" in err_msg:
+        return ScriptGenerationError("Summary too long. Try again.")
+    if "key" in err_msg or "api_key" in err_msg or "invalid" in err_msg and "api" in err_msg:
+        return ScriptGenerationError("Gemini API key missing or invalid. Check GEMINI_API_KEY in .env.")
+    if "blocked" in err_msg or "safety" in err_msg:
+        return ScriptGenerationError("Content was blocked. Try a different focus prompt or chapter.")
+    return ScriptGenerationError(
+        "Failed to generate script. Please try again. (Tip: wait a minute if you hit rate limits.)"
+    )
+
+
+def _episode_request(chunk_text: str, user_prompt: str, model: str | None) -> tuple[str, str, str, str]:
+    """(model, instruction, prompt, cache_key) for a single-episode request."""
+    model = model or GEMINI_MODEL
+    instruction = _episode_instruction(user_prompt)
+    prompt = _excerpt(chunk_text, "Chunk text")
+    return model, instruction, prompt, _script_cache_key(model, _EPISODE_GENERATION, instruction, prompt)
+
+
+def generate_episode_script(
+    chunk_text: str, user_prompt: str = "", *, model: str | None = None, cache: bool = True
+) -> list[dict]:
+    """
+    Generate a short (5-8 turn) two-host script for one chunk. Optional user_prompt focuses the hosts.
+    Same retry/parse/cache as generate_podcast_script.
+    """
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, instruction, prompt, cache_key = _episode_request(chunk_text, user_prompt, model)
+    cached = (_script_cache_get(cache_key) or _inflight_wait(cache_key)) if cache else None
+    if cached is not None:
+        return cached
+    script = _generate_script(model, instruction, prompt, _EPISODE_GENERATION, _episode_error)
+    if cache:
+        _script_cache_set(cache_key, script)
+    return script
+
+
+async def agenerate_episode_script(
+    chunk_text: str, user_prompt: str = "", *, model: str | None = None, cache: bool = True
+) -> list[dict]:
+    """Async generate_episode_script (same prompt, retries and cache)."""
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, instruction, prompt, cache_key = _episode_request(chunk_text, user_prompt, model)
+    cached = (_script_cache_get(cache_key) or await _ainflight_wait(cache_key)) if cache else None
+    if cached is not None:
+        return cached
+    script = await _agenerate_script(model, instruction, prompt, _EPISODE_GENERATION, _episode_error)
+    if cache:
+        _script_cache_set(cache_key, script)
+    return script
+
+
+async def astream_episode_script(
+    chunk_text: str, user_prompt: str = "", *, model: str | None = None, cache: bool = True
+) -> AsyncIterator[dict | None]:
+    """Streaming agenerate_episode_script (see astream_podcast_script)."""
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, instruction, prompt, cache_key = _episode_request(chunk_text, user_prompt, model)
+    cached = (_script_cache_get(cache_key) or await _ainflight_wait(cache_key)) if cache else None
+    if cached is not None:
+        for item in cached:
+            yield item
+        return
+    script = []
+    async for item in _astream_script(model, instruction, prompt, _EPISODE_GENERATION, _episode_error):
+        if item is None:
+            script.clear()
+        else:
+            script.append(item)
+        yield item
+    if cache:
+        _script_cache_set(cache_key, script)
+
+
+# Episode cache keys a running generate_episode_scripts_batch call is generating -> Event set once it is done with
+# them, so a single-episode request for the same chunk waits for the batch instead of paying for a second call
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+# Longest a waiter blocks: one batch call with all its retries
+_INFLIGHT_WAIT_SEC = GEMINI_TIMEOUT * (MAX_RETRIES + 1) + RETRY_DELAY_SEC * MAX_RETRIES
+
+
+def _inflight_claim(keys: list[str]) -> set[str]:
+    """Mark the keys no other batch is generating as in flight; returns the keys claimed."""
+    claimed = set()
+    with _INFLIGHT_LOCK:
+        for key in keys:
+            if key not in _INFLIGHT:
+                _INFLIGHT[key] = threading.Event()
+                claimed.add(key)
+    return claimed
+
+
+def _inflight_release(key: str) -> None:
+    """Wake the requests waiting for key (its script is cached, or the batch gave up on it)."""
+    with _INFLIGHT_LOCK:
+        event = _INFLIGHT.pop(key, None)
+    if event is not None:
+        event.set()
+
+
+def _inflight_wait(key: str) -> list[dict] | None:
+    """If a batch is generating key, wait for it and return the cached script; None when nothing was in flight."""
+    event = _INFLIGHT.get(key)
+    if event is None:
+        return None
+    event.wait(_INFLIGHT_WAIT_SEC)
+    return _script_cache_get(key)
+
+
+async def _ainflight_wait(key: str) -> list[dict] | None:
+    """Async _inflight_wait; the wait runs in a thread so the event loop is not blocked."""
+    event = _INFLIGHT.get(key)
+    if event is None:
+        return None
+    await asyncio.to_thread(event.wait, _INFLIGHT_WAIT_SEC)
+    return _script_cache_get(key)
+
+
+def _batch_groups(indices: list[int], excerpts: list[str], k: int) -> list[list[int]]:
+    """Group indices in order so each group has at most k excerpts and fits GEMINI_MAX_INPUT_CHARS."""
+    groups = []
+    current, size = [], 0
+    for i in indices:
+        n = len(excerpts[i])
+        if current and (len(current) >= k or size + n > GEMINI_MAX_INPUT_CHARS):
+            groups.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += n
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _parse_batch_json(raw: str, count: int) -> list[list[dict]]:
+    """Parse {"episodes": [script, ...]} from model output and validate each of the count scripts."""
+    data = _load_json(raw)
+    try:
+        episodes = data["episodes"]
+    except (TypeError, KeyError, IndexError) as e:
+        raise ScriptGenerationError('Batch must be a JSON object with an "episodes" array.') from e
+    if not isinstance(episodes, list) or len(episodes) != count:
+        raise ScriptGenerationError(f"Batch must contain {count} scripts.")
+    return [_validate_script(script) for script in episodes]
+
+
+def _generate_episode_group(excerpts: list[str], user_prompt: str, model: str) -> list[list[dict]] | None:
+    """
+    One Gemini call for several excerpts. Returns one validated script per excerpt, in order, or None when
+    the reply does not parse (the caller then generates those excerpts one by one). Gemini errors are raised.
+    """
+    instruction = BATCH_EPISODE_INSTRUCTION_TEMPLATE.format(count=len(excerpts), focus_line=_focus_line(user_prompt))
+    prompt = "".join(f"---EPISODE {n}---\n{text}\n" for n, text in enumerate(excerpts, 1))
+    raw = _generate(model, instruction, prompt, _BATCH_GENERATION, _episode_error)
+    try:
+        return _parse_batch_json(raw, len(excerpts))
+    except ScriptGenerationError as e:
+        logger.warning("Batch reply for %d excerpts unusable (%s); generating them one by one", len(excerpts), e)
+        return None
+
+
+def generate_episode_scripts_batch(
+    chunk_texts: list[str], user_prompt: str = "", *, model: str | None = None, k: int | None = None
+) -> list[list[dict]]:
+    """
+    Generate episode scripts for several chunks with as few Gemini calls as possible; returns one script per chunk.
+    Chunks already in the script cache are skipped; the rest are sent k at a time (default BATCH_MAX_EPISODES, see
+    _batch_groups) and each result is cached under the same key generate_episode_script uses, so a later
+    single-episode request is a cache hit. While a chunk is being generated, single-episode requests for it wait
+    for this call (see _INFLIGHT). A group whose reply does not parse falls back to one call per chunk.
+    """
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model = model or GEMINI_MODEL
+    instruction = _episode_instruction(user_prompt)
+    excerpts = [_excerpt(text, "Chunk text") for text in chunk_texts]
+    keys = [_script_cache_key(model, _EPISODE_GENERATION, instruction, text) for text in excerpts]
+    scripts = [_script_cache_get(key) for key in keys]
+
+    missing = [i for i, script in enumerate(scripts) if script is None]
+    claimed = _inflight_claim([keys[i] for i in missing])
+    try:
+        # Chunks another batch is already generating: wait for it rather than asking twice
+        for i in missing:
+            if keys[i] not in claimed:
+                scripts[i] = _inflight_wait(keys[i])
+        missing = [i for i in missing if scripts[i] is None]
+        for group in _batch_groups(missing, excerpts, max(1, k or BATCH_MAX_EPISODES)):
+            batch = None
+            if len(group) > 1:
+                batch = _generate_episode_group([excerpts[i] for i in group], user_prompt, model)
+            for n, i in enumerate(group):
+                # Fallback: the same call generate_episode_script makes (it would wait on this batch's own claims)
+                script = batch[n] if batch is not None else _generate_script(
+                    model, instruction, excerpts[i], _EPISODE_GENERATION, _episode_error
+                )
+                _script_cache_set(keys[i], script)
+                _inflight_release(keys[i])
+                scripts[i] = script
+    finally:
+        for key in claimed:
+            _inflight_release(key)
+    return scripts
+
+
+# Static rules (system instruction, shared by every question) and the per-question user message.
+INTERRUPT_INSTRUCTION = """The user asks the podcast hosts a question about the podcast script they send (what the hosts just said).
+
+Have Host A and Host B each give a brief 1-2 sentence answer based on that script. Stay in character and address the question.
+
+Output ONLY a valid JSON array of exactly 2 elements: [{"speaker": "Host A", "text": "..."}, {"speaker": "Host B", "text": "..."}]. No markdown, no code fence.
+"""
+
+INTERRUPT_PROMPT_TEMPLATE = """The user asked the podcast hosts: "{question}"
 
 Podcast script (what the hosts said):
 {script_text}
 """
 
 
+def _interrupt_error(e: Exception) -> ScriptGenerationError:
+    """Map a Gemini exception from an ask-the-hosts request to a user-facing ScriptGenerationError."""
+    if _is_rate_limit(e):
+        return ScriptGenerationError("Free tier rate limit. Wait 1–2 minutes and try again.")
+    return ScriptGenerationError("Failed to generate reply. Please try again.")
+
+
+def _interrupt_request(
+    question: str, episode_script: list[dict], chunk_text: str | None, model: str | None
+) -> tuple[str, str, str]:
+    """(model, prompt, cache_key) for an ask-the-hosts request."""
+    script_text = "\n".join(f"{item.get('speaker', '')}: {item.get('text') or ''}" for item in episode_script)
+    if chunk_text:
+        script_text = f"{script_text}\n\n[Additional context from the book:\n{chunk_text[:8000]}]"
+    # Escape braces so .format() does not interpret them
+    q_esc = question.replace("{", "{{").replace("}", "}}")
+    s_esc = script_text.replace("{", "{{").replace("}", "}}")
+    prompt = INTERRUPT_PROMPT_TEMPLATE.format(question=q_esc, script_text=s_esc)
+    model = model or GEMINI_MODEL
+    return model, prompt, _script_cache_key(model, _INTERRUPT_GENERATION, INTERRUPT_INSTRUCTION, prompt)
+
+
+def _interrupt_reply(raw: str) -> list[dict]:
+    """Parse the model's reply and keep the first Host A / Host B pair."""
+    data = _parse_script_json(raw)
+    if len(data) < 2:
+        raise ScriptGenerationError("Reply must have at least Host A and Host B.")
+    return data[:2]
+
+
 def generate_interrupt_reply(
     question: str,
     episode_script: list[dict],
     chunk_text: str | None = None,
     *,
     model: str | None = None,
+    cache: bool = True,
 ) -> list[dict]:
     """
     Generate a 2-line reply (Host A, Host B) answering the user's question based on the episode script.
-    Optionally include chunk_text for deeper context.
+    Optionally include chunk_text for deeper context. Cached like the scripts unless cache=False; not retried.
     """
     if not GEMINI_API_KEY:
         raise ScriptGenerationError("GEMINI_API_KEY is not set.")
-    script_text = "\n".join(
-        (item.get("speaker", "") + ": " + (item.get("text") or "")) for item in episode_script
+    model, prompt, cache_key = _interrupt_request(question, episode_script, chunk_text, model)
+    cached = _script_cache_get(cache_key) if cache else None
+    if cached is not None:
+        return cached
+    reply = _interrupt_reply(
+        _generate(model, INTERRUPT_INSTRUCTION, prompt, _INTERRUPT_GENERATION, _interrupt_error, retries=0)
     )
-    if chunk_text:
-        script_text += "\n\n[Additional context from the book:\n" + chunk_text[:8000] + "]"
-    # Escape braces so .format() does not interpret them
-    q_esc = question.replace("{", "{{").replace("}", "}}")
-    s_esc = script_text.replace("{", "{{").replace("}", "}}")
-    prompt = INTERRUPT_INSTRUCTION_TEMPLATE.format(question=q_esc, script_text=s_esc)
-    model = model or GEMINI_MODEL
-    genai.configure(api_key=GEMINI_API_KEY)
+    if cache:
+        _script_cache_set(cache_key, reply)
+    return reply
 
-    try:
-        generative_model = genai.GenerativeModel(model)
-        response = generative_model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.6,
-                max_output_tokens=512,
-            ),
-            request_options={"timeout": GEMINI_TIMEOUT} if GEMINI_TIMEOUT else {},
-        )
-    except Exception as e:
-        err_msg = str(e).lower()
-        if "quota" in err_msg or "rate" in err_msg or "429" in err_msg:
-            raise ScriptGenerationError("Free tier rate limit. Wait 1–2 minutes and try again.") from e
-        raise ScriptGenerationError("Failed to generate reply. Please try again.") from e
-
-    if not response or not response.text:
-        raise ScriptGenerationError("Model returned no text.")
-    data = _parse_script_json(response.text)
-    if len(data) < 2:
-        raise ScriptGenerationError("Reply must have at least Host A and Host B.")
-    return data[:2]
+
+async def agenerate_interrupt_reply(
+    question: str,
+    episode_script: list[dict],
+    chunk_text: str | None = None,
+    *,
+    model: str | None = None,
+    cache: bool = True,
+) -> list[dict]:
+    """
+    Async generate_interrupt_reply (same prompt and cache). Several questions about the same episode can be
+    answered concurrently with asyncio.gather(*(agenerate_interrupt_reply(q, script) for q in questions)).
+    """
+    if not GEMINI_API_KEY:
+        raise ScriptGenerationError("GEMINI_API_KEY is not set.")
+    model, prompt, cache_key = _interrupt_request(question, episode_script, chunk_text, model)
+    cached = _script_cache_get(cache_key) if cache else None
+    if cached is not None:
+        return cached
+    reply = _interrupt_reply(
+        await _agenerate(model, INTERRUPT_INSTRUCTION, prompt, _INTERRUPT_GENERATION, _interrupt_error, retries=0)
+    )
+    if cache:
+        _script_cache_set(cache_key, reply)
+    return reply
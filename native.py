@@ -0,0 +1,54 @@
+"""
+Run blocking work on a native OS thread when the process is monkey-patched by gevent (wsgi.py, gunicorn).
+Under gevent every request and job greenlet shares the hub's OS thread, so an asyncio event loop or CPU-bound call
+started there blocks (or, for asyncio.run, collides with) every other greenlet. No Flask imports.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+# Native ident of the thread that imports this module (the app imports it at startup, on the hub thread).
+# threading.main_thread() is a greenlet-aware stand-in once patched, so it cannot answer this later.
+_HUB_IDENT = monkey.get_original("_thread", "get_ident")() if monkey is not None else None
+
+
+def in_hub_thread() -> bool:
+    """True when gevent has patched threading and the caller runs on the hub's OS thread."""
+    if monkey is None or not monkey.is_module_patched("threading"):
+        return False
+    return monkey.get_original("_thread", "get_ident")() == _HUB_IDENT
+
+
+def call(fn, *args, **kwargs):
+    """
+    Return fn(*args, **kwargs). On the gevent hub thread it runs in gevent's native threadpool while the calling
+    greenlet waits cooperatively; anywhere else (no gevent, or already on a worker thread) it runs inline.
+    """
+    if in_hub_thread():
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+def spawn(fn, *args) -> None:
+    """Start fn(*args) in the background on a native thread (gevent's threadpool on the hub, else a daemon thread)."""
+    if in_hub_thread():
+        import gevent
+        gevent.get_hub().threadpool.spawn(fn, *args)
+    else:
+        import threading
+        threading.Thread(target=fn, args=args, daemon=True).start()
+
+
+def executor(max_workers: int, thread_name_prefix: str = "") -> ThreadPoolExecutor:
+    """
+    A ThreadPoolExecutor whose workers are real OS threads. Once threading is patched the stdlib pool's workers are
+    greenlets on the hub thread, so a job that starts an event loop or does CPU work would stall every request.
+    """
+    if in_hub_thread():
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
@@ -2,15 +2,22 @@
 Extract plain text from uploaded PDF and EPUB files.
 No Flask imports; pure logic for easy testing.
 Supports single-string output (parse_ebook) and chunked output (parse_ebook_chunks).
+PDF text comes from PDFium (pypdfium2); page ranges are extracted in parallel in a process pool (CPU-bound).
 """
-import re
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections.abc import Iterator
+from functools import partial
 from pathlib import Path
 
-from PyPDF2 import PdfReader
-from PyPDF2.errors import PdfReadError
+import pypdfium2 as pdfium
 import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
 # Optional: use config for max length; avoid circular import by defaulting
 try:
@@ -18,10 +25,12 @@ try:
     _MAX_TEXT_LENGTH = getattr(config, "MAX_TEXT_LENGTH", 300_000)
     _MAX_CHUNK_CHARS = getattr(config, "MAX_CHUNK_CHARS", None)  # None => use GEMINI_MAX_INPUT_CHARS or 30_000
     _PDF_CHUNK_PAGES = getattr(config, "PDF_CHUNK_PAGES", 8)
+    _PDF_PARSE_WORKERS = getattr(config, "PDF_PARSE_WORKERS", 1)
 except ImportError:
     _MAX_TEXT_LENGTH = 300_000
     _MAX_CHUNK_CHARS = 30_000
     _PDF_CHUNK_PAGES = 8
+    _PDF_PARSE_WORKERS = 1
 
 # Fallback for MAX_CHUNK_CHARS when not set in config
 try:
@@ -35,98 +44,236 @@ class ParsingError(Exception):
     pass
 
 
-def _normalize_text(text: str) -> str:
-    """Collapse whitespace and trim."""
-    if not text or not text.strip():
-        return ""
-    return re.sub(r"\s+", " ", text.strip())
+# EPUB content documents are UTF-8 XHTML; comments are dropped while parsing
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True)
 
 
-def _extract_pdf(path: str) -> str:
-    """Extract text from a PDF file using PyPDF2."""
-    try:
-        reader = PdfReader(path)
-        parts = []
-        for page in reader.pages:
-            raw = page.extract_text()
-            if raw:
-                parts.append(raw)
-        combined = "\n".join(parts)
-        if not combined.strip():
-            raise ParsingError("PDF appears to have no extractable text (e.g. scanned pages).")
-        return _normalize_text(combined)
-    except PdfReadError as e:
-        raise ParsingError("Could not read PDF. File may be corrupted or invalid.") from e
-    except Exception as e:
-        if isinstance(e, ParsingError):
-            raise
-        raise ParsingError("Could not read PDF.") from e
+# Elements that start a new line of text (for _html_text(lines=True))
+_BLOCK_TAGS = (
+    "p", "div", "br", "li", "dt", "dd", "tr", "td", "th", "blockquote", "pre", "header", "footer", "section",
+    "article", "aside", "nav", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6",
+)
 
 
-def _extract_epub(path: str) -> str:
-    """Extract text from an EPUB using ebooklib and BeautifulSoup."""
+def _html_text(content: bytes, lines: bool = False) -> str:
+    """
+    Text of an (X)HTML document with lxml: every text node joined by spaces, scripts and styles dropped.
+    With lines=True block elements are also wrapped in newlines, so running headers and footers stay on lines
+    of their own for _drop_repeated_lines (normalizing the result is the same either way).
+    """
     try:
-        book = epub.read_epub(path)
-        parts = []
-        for item in book.get_items():
-            if item.get_type() != ebooklib.ITEM_DOCUMENT:
-                continue
-            content = item.get_content()
-            if not content:
-                continue
-            soup = BeautifulSoup(content, "html.parser")
-            text = soup.get_text(separator=" ", strip=True)
-            if text:
-                parts.append(text)
-        combined = " ".join(parts)
-        if not combined.strip():
-            raise ParsingError("EPUB appears to have no extractable text.")
-        return _normalize_text(combined)
-    except ParsingError:
-        raise
-    except Exception as e:
-        raise ParsingError("Invalid or corrupted EPUB.") from e
+        root = lxml.html.document_fromstring(content, parser=_HTML_PARSER)
+    except etree.ParserError:
+        # Empty or whitespace-only document
+        return ""
+    etree.strip_elements(root, "script", "style", with_tail=False)
+    if lines:
+        for el in root.iter(*_BLOCK_TAGS):
+            el.text = "\n" + (el.text or "")
+            el.tail = "\n" + (el.tail or "")
+    return " ".join(root.itertext())
+
+
+def _normalize_text(text: str) -> str:
+    """
+    Collapse whitespace and trim. str.split() splits on the same Unicode whitespace as the regex \\s+,
+    and does it in one C pass without the regex engine.
+    """
+    return " ".join(text.split()) if text else ""
+
+
+# Boilerplate (running header or footer, navigation link) is only looked for among the first and last lines of a
+# page (PDF) or document (EPUB) that have at least _BOILERPLATE_MIN_CHARS characters, so short dialogue ("Yes.")
+# is never a candidate. A candidate that is an edge line of at least _BOILERPLATE_MIN_PAGES pages, and of at least
+# a quarter of the book's pages, is boilerplate.
+_BOILERPLATE_MIN_CHARS = 8
+_BOILERPLATE_MIN_PAGES = 3
+
+
+def _text_lines(text: str) -> list[str]:
+    """Non-empty lines of text, each with its whitespace collapsed (joined by spaces they equal _normalize_text)."""
+    return [line for line in (" ".join(raw.split()) for raw in text.splitlines()) if line]
+
+
+def _edge_lines(page: list[str]) -> set[str]:
+    """The first and last line of a page, if long enough to be boilerplate candidates."""
+    return {line for line in (page[:1] + page[-1:]) if len(line) >= _BOILERPLATE_MIN_CHARS}
+
+
+def _boilerplate(chunk_pages: list[list[list[str]]]) -> set[str]:
+    """Lines that are boilerplate in a book given as chunks of pages of lines (see _BOILERPLATE_MIN_CHARS)."""
+    counts = Counter()
+    pages = 0
+    for chunk in chunk_pages:
+        for page in chunk:
+            counts.update(_edge_lines(page))
+            pages += 1
+    threshold = max(_BOILERPLATE_MIN_PAGES, pages // 4)
+    return {line for line, n in counts.items() if n >= threshold}
+
+
+def _drop_repeated_lines(chunk_pages: list[list[list[str]]]) -> list[str]:
+    """
+    Join each chunk's pages of lines into its normalized text, dropping every occurrence of a boilerplate line at
+    the edge of a page except the first in the book, so Gemini does not get the same header once per page or
+    chapter. The same text inside a page is left alone.
+    """
+    repeated = _boilerplate(chunk_pages)
+    if not repeated:
+        return [" ".join(line for page in chunk for line in page) for chunk in chunk_pages]
+    texts = []
+    seen = set()
+    for chunk in chunk_pages:
+        kept = []
+        for page in chunk:
+            last = len(page) - 1
+            for i, line in enumerate(page):
+                if (i == 0 or i == last) and line in repeated:
+                    if line in seen:
+                        continue
+                    seen.add(line)
+                kept.append(line)
+        texts.append(" ".join(kept))
+    return texts
 
 
 # --- Chunked extraction (V2) ---
 
 
-def _truncate_chunk(text: str, max_chars: int) -> str:
-    """Truncate a single chunk to max_chars; append note if truncated."""
-    if not text or max_chars <= 0:
-        return text or ""
-    if len(text) <= max_chars:
-        return text
-    return text[:max_chars] + "\n\n[Text truncated for length.]"
+_TRUNCATION_NOTE = "\n\n[Text truncated for length.]"
+
+
+def _chunk_view(chunk_id: int, title: str, text: str, max_chars: int) -> dict:
+    """
+    Internal chunk: {id, title, _src, _end, _truncated}. The text is _src[:_end] plus the truncation note when
+    _truncated; it is only sliced once, by _materialize_chunk, however often the chunk is trimmed.
+    """
+    truncated = 0 < max_chars < len(text)
+    return {"id": chunk_id, "title": title, "_src": text, "_end": max_chars if truncated else len(text),
+            "_truncated": truncated}
+
+
+def _chunk_len(c: dict) -> int:
+    """Length of the chunk's materialized text."""
+    return c["_end"] + len(_TRUNCATION_NOTE) if c["_truncated"] else c["_end"]
+
+
+def _materialize_chunk(c: dict) -> dict:
+    """Public {id, title, text} chunk from an internal view."""
+    text = c["_src"][: c["_end"]] + _TRUNCATION_NOTE if c["_truncated"] else c["_src"][: c["_end"]]
+    return {"id": c["id"], "title": c["title"], "text": text}
+
+
+# Process pool for PDF page-range extraction; created on first use and reused across requests.
+# Documents shorter than _PDF_PARALLEL_MIN_PAGES are extracted in the calling process (pool overhead would dominate).
+_PDF_PARALLEL_MIN_PAGES = 16
+_PDF_POOL = None
+_PDF_POOL_LOCK = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """Return the shared PDF extraction pool. Uses spawn so workers never inherit server threads/greenlets."""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            _PDF_POOL = ProcessPoolExecutor(
+                max_workers=_PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _PDF_POOL
+
+
+def _reset_pdf_pool() -> None:
+    """Drop a broken pool (e.g. a worker was killed) so the next call starts a fresh one."""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is not None:
+            _PDF_POOL.shutdown(wait=False, cancel_futures=True)
+        _PDF_POOL = None
+
+
+# PDFium is not thread-safe; serializes document access within a process (pool workers each have their own)
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _pdf_page_count(path: str) -> int:
+    """Number of pages in the PDF."""
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _enumerate_page_ranges(path: str, pages_per_chunk: int) -> list[tuple[int, int, str]]:
+    """Split the PDF into (start, end, title) page ranges of pages_per_chunk pages."""
+    num_pages = _pdf_page_count(path)
+    if not num_pages:
+        raise ParsingError("PDF has no pages.")
+    ranges = []
+    for start in range(0, num_pages, pages_per_chunk):
+        end = min(start + pages_per_chunk, num_pages)
+        ranges.append((start, end, f"Pages {start + 1}\u2013{end}"))
+    return ranges
+
+
+def _extract_pages(path: str, start: int, end: int, lines: bool = False) -> str | list[str]:
+    """
+    Return normalized text of pages [start, end), or with lines=True the raw text of each page, line breaks kept
+    (for _drop_repeated_lines). Opens its own document so it can run in a worker process.
+    """
+    parts = []
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            for i in range(start, end):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                raw = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                if raw:
+                    parts.append(raw)
+        finally:
+            pdf.close()
+    return parts if lines else _normalize_text("\n".join(parts))
+
+
+def _extract_page_ranges(
+    path: str, starts: tuple[int, ...], ends: tuple[int, ...], lines: bool = False
+) -> list[str] | list[list[str]]:
+    """
+    Extract each page range (see _extract_pages), in parallel when there is more than one range, workers are
+    configured and the ranges cover at least _PDF_PARALLEL_MIN_PAGES pages. Each task opens the file once for
+    its whole range.
+    """
+    if len(starts) > 1 and _PDF_PARSE_WORKERS > 1 and ends[-1] - starts[0] >= _PDF_PARALLEL_MIN_PAGES:
+        try:
+            return list(_get_pdf_pool().map(partial(_extract_pages, path, lines=lines), starts, ends))
+        except BrokenProcessPool:
+            _reset_pdf_pool()
+    return [_extract_pages(path, start, end, lines) for start, end in zip(starts, ends)]
 
 
 def _extract_pdf_chunks(path: str, pages_per_chunk: int) -> list[dict]:
-    """Extract PDF as chunks by page ranges. Each chunk: {id, title, text}."""
+    """Extract PDF as chunks by page ranges (internal views, see _chunk_view), without repeated running headers."""
     try:
-        reader = PdfReader(path)
-        pages = list(reader.pages)
-        if not pages:
-            raise ParsingError("PDF has no pages.")
+        ranges = _enumerate_page_ranges(path, pages_per_chunk)
+        starts, ends, titles = zip(*ranges)
+        ranges = _extract_page_ranges(path, starts, ends, lines=True)
+        texts = _drop_repeated_lines([[_text_lines(page) for page in pages] for pages in ranges])
         chunks = []
         chunk_id = 1
-        for start in range(0, len(pages), pages_per_chunk):
-            end = min(start + pages_per_chunk, len(pages))
-            parts = []
-            for i in range(start, end):
-                raw = pages[i].extract_text()
-                if raw:
-                    parts.append(raw)
-            text = _normalize_text("\n".join(parts))
+        for title, text in zip(titles, texts):
             if not text:
                 continue
-            title = f"Pages {start + 1}\u2013{end}"
-            text = _truncate_chunk(text, _MAX_CHUNK_CHARS)
-            chunks.append({"id": chunk_id, "title": title, "text": text})
+            chunks.append(_chunk_view(chunk_id, title, text, _MAX_CHUNK_CHARS))
             chunk_id += 1
         if not chunks:
             raise ParsingError("PDF appears to have no extractable text (e.g. scanned pages).")
         return chunks
-    except PdfReadError as e:
+    except pdfium.PdfiumError as e:
         raise ParsingError("Could not read PDF. File may be corrupted or invalid.") from e
     except ParsingError:
         raise
@@ -134,102 +281,104 @@ def _extract_pdf_chunks(path: str, pages_per_chunk: int) -> list[dict]:
         raise ParsingError("Could not read PDF.") from e
 
 
-def _toc_links(book: epub.EpubBook) -> list[tuple[str, str]]:
-    """Flatten TOC into a list of (href, title). Recursively walks Link and Section."""
-    result = []
-
-    def walk(toc):
+def _toc_links(book: epub.EpubBook) -> Iterator[tuple[str, str]]:
+    """
+    Yield (href, title) for each TOC link in reading order. Walks Link, Section and nested lists with an
+    explicit stack (no recursion limit on deep TOCs); lazy, so the caller can stop early.
+    """
+    stack = [getattr(book, "toc", None)]
+    while stack:
+        toc = stack.pop()
         if toc is None:
-            return
+            continue
         if isinstance(toc, (list, tuple)):
-            for item in toc:
-                walk(item)
-            return
+            stack.extend(reversed(toc))
+            continue
         if hasattr(toc, "href") and hasattr(toc, "title"):
             # epub.Link
             if getattr(toc, "href", None):
-                result.append((toc.href, getattr(toc, "title") or "Untitled"))
-            return
+                yield toc.href, getattr(toc, "title") or "Untitled"
+            continue
         if hasattr(toc, "title") and hasattr(toc, "children"):
             # Section with children
-            for child in getattr(toc, "children", []) or []:
-                walk(child)
-            return
+            stack.extend(reversed(list(getattr(toc, "children", []) or [])))
+            continue
         if hasattr(toc, "title") and hasattr(toc, "__iter__") and not isinstance(toc, str):
             try:
-                for child in toc:
-                    walk(child)
+                stack.extend(reversed(list(toc)))
             except TypeError:
                 pass
 
-    walk(getattr(book, "toc", None))
-    return result
-
 
 def _extract_epub_chunks(path: str) -> list[dict]:
-    """Extract EPUB as chunks by TOC (chapters). Fallback: one chunk per document or single chunk."""
+    """
+    Extract EPUB as chunks by TOC (chapters), as internal views (see _chunk_view), without repeated
+    boilerplate lines. Fallback: one chunk per document or single chunk.
+    """
     try:
         book = epub.read_epub(path)
-        # Build href -> item map (file_name and basename for TOC resolution)
-        items_by_href = {}
-        for item in book.get_items():
-            if item.get_type() != ebooklib.ITEM_DOCUMENT:
-                continue
-            name = getattr(item, "file_name", None)
-            if not name and callable(getattr(item, "get_name", None)):
-                name = item.get_name()
+        # TOC hrefs are relative to the nav/NCX file, manifest names to the OPF: resolve both by basename.
+        # On a basename clash the first document in manifest order wins.
+        items_by_basename = {}
+        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
+            name = getattr(item, "file_name", None) or item.get_name()
             if name:
-                items_by_href[name] = item
-                if "/" in name:
-                    items_by_href[name.split("/")[-1]] = item
+                items_by_basename.setdefault(name.rsplit("/", 1)[-1], item)
 
-        links = _toc_links(book)
-        chunks = []
+        chapters = []  # (title, lines) per TOC document, in reading order
         seen_hrefs = set()
-        chunk_id = 1
+        total = 0
 
-        for href, title in links:
+        for href, title in _toc_links(book):
+            # _apply_global_cap drops everything past MAX_TEXT_LENGTH, so stop reading chapters once it is reached
+            if total >= _MAX_TEXT_LENGTH:
+                break
             # Normalize href: strip fragment, use as key
             base_href = href.split("#")[0].lstrip("/")
             if not base_href or base_href in seen_hrefs:
                 continue
-            item = None
-            if hasattr(book, "get_item_with_href"):
-                item = book.get_item_with_href(href) or book.get_item_with_href(base_href)
-            if item is None:
-                item = items_by_href.get(base_href) or items_by_href.get(href.split("/")[-1] if "/" in href else href) or items_by_href.get(href)
+            item = items_by_basename.get(base_href.rsplit("/", 1)[-1])
             if item is None:
                 continue
             seen_hrefs.add(base_href)
             content = item.get_content()
             if not content:
                 continue
-            soup = BeautifulSoup(content, "html.parser")
-            text = soup.get_text(separator=" ", strip=True)
+            lines = _text_lines(_html_text(content, lines=True))
+            if not lines:
+                continue
+            chapters.append((title, lines))
+            # Chunk length before boilerplate is dropped (so this may stop slightly early)
+            size = sum(map(len, lines)) + len(lines) - 1
+            total += _MAX_CHUNK_CHARS + len(_TRUNCATION_NOTE) if 0 < _MAX_CHUNK_CHARS < size else size
+
+        chunks = []
+        chunk_id = 1
+        # Each chapter is one document, i.e. a single page for _drop_repeated_lines
+        for (title, _), text in zip(chapters, _drop_repeated_lines([[lines] for _, lines in chapters])):
             if not text:
                 continue
-            text = _normalize_text(text)
-            text = _truncate_chunk(text, _MAX_CHUNK_CHARS)
-            chunks.append({"id": chunk_id, "title": title or f"Chapter {chunk_id}", "text": text})
+            chunks.append(_chunk_view(chunk_id, title or f"Chapter {chunk_id}", text, _MAX_CHUNK_CHARS))
             chunk_id += 1
 
         if chunks:
             return _apply_global_cap(chunks)
 
         # Fallback: one chunk per document item (spine order or get_items)
+        sections = []
         for item in book.get_items():
             if item.get_type() != ebooklib.ITEM_DOCUMENT:
                 continue
             content = item.get_content()
             if not content:
                 continue
-            soup = BeautifulSoup(content, "html.parser")
-            text = soup.get_text(separator=" ", strip=True)
+            lines = _text_lines(_html_text(content, lines=True))
+            if lines:
+                sections.append(lines)
+        for text in _drop_repeated_lines([[lines] for lines in sections]):
             if not text:
                 continue
-            text = _normalize_text(text)
-            text = _truncate_chunk(text, _MAX_CHUNK_CHARS)
-            chunks.append({"id": chunk_id, "title": f"Section {chunk_id}", "text": text})
+            chunks.append(_chunk_view(chunk_id, f"Section {chunk_id}", text, _MAX_CHUNK_CHARS))
             chunk_id += 1
 
         if not chunks:
@@ -242,17 +391,20 @@ def _extract_epub_chunks(path: str) -> list[dict]:
 
 
 def _apply_global_cap(chunks: list[dict]) -> list[dict]:
-    """Trim or drop chunks so total text stays under MAX_TEXT_LENGTH."""
+    """Trim or drop chunk views so total text stays under MAX_TEXT_LENGTH. Stops at the first chunk over the cap."""
     total = 0
     out = []
     for c in chunks:
-        total += len(c["text"])
+        length = _chunk_len(c)
+        total += length
         if total > _MAX_TEXT_LENGTH:
-            # Trim this chunk to fit
-            allowance = _MAX_TEXT_LENGTH - (total - len(c["text"]))
+            # Trim this chunk to fit by moving its end (views are built by the extractors, so this is safe).
+            # An allowance that falls inside the truncation note keeps the whole note.
+            allowance = _MAX_TEXT_LENGTH - (total - length)
             if allowance <= 0:
                 break
-            c = {**c, "text": _truncate_chunk(c["text"], allowance)}
+            c["_end"] = min(c["_end"], allowance)
+            c["_truncated"] = True
         out.append(c)
         if total >= _MAX_TEXT_LENGTH:
             break
@@ -279,7 +431,7 @@ def parse_ebook_chunks(file_path: str, filename: str) -> list[dict]:
     if not chunks:
         raise ParsingError("No text could be extracted from the file.")
 
-    return chunks
+    return [_materialize_chunk(c) for c in chunks]
 
 
 def parse_ebook(file_path: str, filename: str) -> str:
@@ -288,8 +440,16 @@ def parse_ebook(file_path: str, filename: str) -> str:
     Infers type from extension. Truncates to MAX_TEXT_LENGTH if configured.
     Kept for backward compatibility; new code should use parse_ebook_chunks.
     """
-    chunks = parse_ebook_chunks(file_path, filename)
-    combined = "\n\n".join(c["text"] for c in chunks)
-    if len(combined) > _MAX_TEXT_LENGTH:
-        combined = combined[:_MAX_TEXT_LENGTH] + "\n\n[Text truncated for length.]"
-    return combined
+    # Same result as joining every chunk with blank lines and cutting at MAX_TEXT_LENGTH, but stops copying
+    # text once the budget is spent instead of building the whole book first
+    parts = []
+    used = 0
+    for c in parse_ebook_chunks(file_path, filename):
+        for piece in ("\n\n", c["text"]) if parts else (c["text"],):
+            if used + len(piece) > _MAX_TEXT_LENGTH:
+                parts.append(piece[: _MAX_TEXT_LENGTH - used])
+                parts.append(_TRUNCATION_NOTE)
+                return "".join(parts)
+            parts.append(piece)
+            used += len(piece)
+    return "".join(parts)
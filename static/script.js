@@ -61,6 +61,12 @@
 
   let progressTimeouts = [];
 
+  // Gemini + TTS endpoints return 202 { job_id }; poll /api/job/<id> at this interval until done
+  const JOB_POLL_MS = 1500;
+  // After an episode is ready, draft scripts for this many following episodes in one batched request
+  const PREFETCH_EPISODES = 2;
+  let prefetchedKeys = {};
+
   function setTheme(theme) {
     document.documentElement.setAttribute("data-theme", theme);
     try { localStorage.setItem("auracast-theme", theme); } catch (e) {}
@@ -164,6 +170,47 @@
     }, PROGRESS_TRANSITION_MS);
   }
 
+  function readJson(res) {
+    return res.json().catch(function () { return {}; }).then(function (data) { return { res: res, data: data }; });
+  }
+
+  function pollJob(jobId) {
+    return new Promise(function (resolve, reject) {
+      function poll() {
+        fetch("/api/job/" + encodeURIComponent(jobId))
+          .then(readJson)
+          .then(function (_) {
+            var job = _.data;
+            if (!_.res.ok) {
+              resolve(_);
+            } else if (job.state === "done") {
+              resolve({ res: { ok: true }, data: job.result || {} });
+            } else if (job.state === "error") {
+              resolve({ res: { ok: false }, data: { error: job.error } });
+            } else {
+              setTimeout(poll, JOB_POLL_MS);
+            }
+          })
+          .catch(reject);
+      }
+      poll();
+    });
+  }
+
+  // POST JSON to a job endpoint and resolve with { res, data } once the job finishes (same shape as a direct response)
+  function submitJob(url, payload) {
+    return fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload)
+    })
+      .then(readJson)
+      .then(function (_) {
+        if (!_.res.ok || !_.data.job_id) return _;
+        return pollJob(_.data.job_id);
+      });
+  }
+
   function escapeHtml(s) {
     const div = document.createElement("div");
     div.textContent = s;
@@ -269,6 +316,23 @@
     });
   }
 
+  // Fire-and-forget: the server caches the scripts (and makes a request for an episode still in this batch wait
+  // for it), so generating these episodes later only runs TTS
+  function prefetchFollowingEpisodes(episodeId, userPrompt) {
+    var idx = currentEpisodes.findIndex(function (ep) { return String(ep.id) === String(episodeId); });
+    if (idx < 0 || !currentUploadId) return;
+    var ids = currentEpisodes.slice(idx + 1, idx + 1 + PREFETCH_EPISODES)
+      .map(function (ep) { return ep.id; })
+      .filter(function (id) { return !prefetchedKeys[currentUploadId + "|" + id + "|" + userPrompt]; });
+    if (!ids.length) return;
+    ids.forEach(function (id) { prefetchedKeys[currentUploadId + "|" + id + "|" + userPrompt] = true; });
+    fetch("/api/generate_episodes_batch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ upload_id: currentUploadId, episode_ids: ids, user_prompt: userPrompt })
+    }).catch(function () {});
+  }
+
   if (tryDemoBtn) {
     tryDemoBtn.addEventListener("click", function () {
       hideError();
@@ -283,7 +347,7 @@
           tryDemoBtn.disabled = false;
           progressSection.setAttribute("hidden", "");
           if (!res.ok) {
-            showError(data.error || "Demo failed. Check that ffmpeg is installed.");
+            showError(data.error || "Demo failed. Please try again.");
             return;
           }
           var script = data.script || [];
@@ -311,10 +375,16 @@
     progressSection.removeAttribute("hidden");
     setProgress(20, "Extracting text from eBook...");
 
-    var formData = new FormData(form);
-    formData.append("language", document.getElementById("setting-language").value);
-    formData.append("vibe", document.getElementById("setting-vibe").value);
-    fetch("/api/parse", { method: "POST", body: formData })
+    // Send the file as the raw body (not multipart) so the server can stream it straight to disk
+    var file = fileInput.files[0];
+    fetch("/api/parse", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/octet-stream",
+        "X-Filename": encodeURIComponent(file.name)
+      },
+      body: file
+    })
       .then(function (res) { return res.json().catch(function () { return {}; }).then(function (data) { return { res: res, data: data }; }); })
       .then(function (_) {
         var res = _.res;
@@ -375,12 +445,7 @@
         episode_id: parseInt(selectedEpisodeId, 10),
         user_prompt: (episodePromptInput && episodePromptInput.value) ? episodePromptInput.value.trim() : ""
       };
-      fetch("/api/generate_episode", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload)
-      })
-        .then(function (res) { return res.json().catch(function () { return {}; }).then(function (data) { return { res: res, data: data }; }); })
+      submitJob("/api/generate_episode", payload)
         .then(function (_) {
           var res = _.res;
           var data = _.data;
@@ -393,6 +458,7 @@
           var script = data.script || [];
           var audioUrl = data.audio_url != null ? data.audio_url : null;
           showResult(script, audioUrl, selectedEpisodeTitle);
+          prefetchFollowingEpisodes(payload.episode_id, payload.user_prompt);
         })
         .catch(function () {
           showError("Network error. Please try again.");
@@ -485,12 +551,7 @@
         return;
       }
       interruptAskSubmit.disabled = true;
-      fetch("/api/ask_hosts", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ question: question, episode_script: currentEpisodeScript })
-      })
-        .then(function (res) { return res.json().catch(function () { return {}; }).then(function (data) { return { res: res, data: data }; }); })
+      submitJob("/api/ask_hosts", { question: question, episode_script: currentEpisodeScript })
         .then(function (_) {
           interruptAskSubmit.disabled = false;
           if (!_.res.ok) {
@@ -0,0 +1,124 @@
+"""
+Streaming script generation against a fake Gemini client (no network, no API key needed).
+Run from the project root: python -m unittest (or python -m pytest).
+"""
+import asyncio
+import contextlib
+import unittest
+from unittest import mock
+
+import llm_generator
+
+TURN = '{"speaker": "Host A", "text": "%s"}'
+
+
+def _cut(*texts: str) -> str:
+    """A reply cut off at max_output_tokens: the turns, then the start of one more."""
+    return "[" + ",".join(TURN % t for t in texts) + ', {"speaker": "Host B", "te'
+
+
+def _full(*texts: str) -> str:
+    return "[" + ",".join(TURN % t for t in texts) + "]"
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModels:
+    """Streams each queued reply in small pieces and records the max_output_tokens of every request."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.caps = []
+
+    async def generate_content_stream(self, model, contents, config):
+        self.caps.append(config.max_output_tokens)
+        reply = self.replies.pop(0)
+
+        async def stream():
+            for i in range(0, len(reply), 7):
+                yield _Chunk(reply[i : i + 7])
+
+        return stream()
+
+
+class StreamEpisodeScriptTest(unittest.TestCase):
+    def setUp(self):
+        self.models = None
+        self.clients = 0
+        client = mock.Mock()
+
+        @contextlib.asynccontextmanager
+        async def fake_client():
+            self.clients += 1
+            client.models = self.models
+            yield client
+
+        for name, value in {
+            "GEMINI_API_KEY": "test",
+            "_GEMINI_LIMITER": None,
+            "_async_client": fake_client,
+            "_disk_cache": lambda: None,
+            "_SCRIPT_CACHE": {},
+        }.items():
+            patcher = mock.patch.object(llm_generator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _stream(self, chunk_text, *replies):
+        """Run astream_episode_script; returns (turn texts with None for a restart, error or None)."""
+        self.models = _FakeModels(replies)
+        texts = []
+
+        async def run():
+            async for item in llm_generator.astream_episode_script(chunk_text):
+                texts.append(None if item is None else item["text"])
+
+        try:
+            asyncio.run(run())
+        except llm_generator.ScriptGenerationError as e:
+            return texts, e
+        return texts, None
+
+    def _cached(self, chunk_text):
+        return llm_generator._script_cache_get(llm_generator._episode_request(chunk_text, "", None)[3])
+
+    def test_complete_stream_is_cached(self):
+        texts, error = self._stream("complete", _full("one", "two"))
+        self.assertIsNone(error)
+        self.assertEqual(texts, ["one", "two"])
+        self.assertEqual([t["text"] for t in self._cached("complete")], ["one", "two"])
+
+    def test_truncated_stream_is_regenerated_at_twice_the_cap(self):
+        texts, error = self._stream("truncated", _cut("one", "two"), _full("uno", "dos", "three"))
+        self.assertIsNone(error)
+        # None restarts the script: only the retry's turns make it up, never a splice of both replies
+        self.assertEqual(texts, ["one", "two", None, "uno", "dos", "three"])
+        cap = llm_generator._EPISODE_GENERATION["max_output_tokens"]
+        self.assertEqual(self.models.caps, [cap, 2 * cap])
+        # Both requests share one async client
+        self.assertEqual(self.clients, 1)
+        self.assertEqual([t["text"] for t in self._cached("truncated")], ["uno", "dos", "three"])
+
+    def test_truncated_twice_raises_and_is_not_cached(self):
+        texts, error = self._stream("cut twice", _cut("one", "two"), _cut("uno", "dos", "three"))
+        self.assertIsInstance(error, llm_generator.ScriptGenerationError)
+        self.assertEqual(texts, ["one", "two", None, "uno", "dos", "three"])
+        self.assertIsNone(self._cached("cut twice"))
+
+    def test_empty_retry_raises_and_is_not_cached(self):
+        texts, error = self._stream("empty retry", _cut("one", "two"), "[]")
+        self.assertIsInstance(error, llm_generator.ScriptGenerationError)
+        self.assertEqual(texts, ["one", "two", None])
+        self.assertIsNone(self._cached("empty retry"))
+
+    def test_non_object_element_raises_and_is_not_cached(self):
+        _, error = self._stream("stray", "[" + TURN % "one" + ", 5]")
+        self.assertIsInstance(error, llm_generator.ScriptGenerationError)
+        self.assertIsNone(self._cached("stray"))
+
+
+if __name__ == "__main__":
+    unittest.main()
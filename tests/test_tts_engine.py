@@ -0,0 +1,77 @@
+"""
+TTS under gevent: concurrent syntheses from separate greenlets must not share one OS thread's event loop.
+Runs in a subprocess so monkey.patch_all() does not leak into the rest of the suite; edge-tts is faked (no network).
+"""
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CONCURRENT = textwrap.dedent(
+    """
+    from gevent import monkey
+    monkey.patch_all()
+
+    import asyncio, os, sys, tempfile
+    import gevent
+    import edge_tts
+    import tts_engine
+
+    class FakeCommunicate:
+        def __init__(self, text, voice):
+            self.text = text
+
+        async def stream(self):
+            await asyncio.sleep(0.05)
+            yield {"type": "audio", "data": self.text.encode()}
+
+    edge_tts.Communicate = FakeCommunicate
+    out = tempfile.mkdtemp()
+
+    async def stream(script, restart):
+        # restart: a line from a reply that was cut off, then the None that tells TTS to drop it
+        for item in ([{"speaker": "Host A", "text": "cut"}, None] if restart else []) + script:
+            await asyncio.sleep(0.02)
+            yield item
+
+    def run(n):
+        # Even n: a finished script; odd n: a script streamed in as it is generated (n == 3 restarts once)
+        path = os.path.join(out, "%d.mp3" % n)
+        script = [{"speaker": "Host A", "text": "a%d" % n}, {"speaker": "Host B", "text": "b%d" % n}]
+        if n % 2:
+            tts_engine.synthesize_podcast_stream(stream(script, n == 3), path)
+        else:
+            tts_engine.synthesize_podcast(script, path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    jobs = [gevent.spawn(run, n) for n in range(4)]
+    gevent.joinall(jobs)
+    for n, job in enumerate(jobs):
+        if not job.successful():
+            sys.exit("synthesis %d failed: %r" % (n, job.exception))
+        if job.value != b"a%db%d" % (n, n):
+            sys.exit("synthesis %d wrote %r" % (n, job.value))
+    """
+)
+
+
+@unittest.skipIf(gevent is None, "gevent not installed")
+class GeventSynthesisTest(unittest.TestCase):
+    def test_concurrent_syntheses_under_patch_all(self):
+        result = subprocess.run(
+            [sys.executable, "-c", _CONCURRENT], cwd=ROOT, capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
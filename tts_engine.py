@@ -1,14 +1,25 @@
 """
-Synthesize podcast audio from script using edge-tts; merge segments with ffmpeg.
-No Flask imports. Requires ffmpeg for concatenating MP3s (avoids pydub/audioop on Python 3.13+).
+Synthesize podcast audio from script using edge-tts. No Flask imports.
+Each segment's MP3 stream is collected in memory and the segments are written back to back into one file:
+Edge TTS returns constant-bitrate MP3 frames with the same codec settings for every voice, so no ffmpeg or remux is needed.
+synthesize_podcast_stream takes the script as an async iterator and starts each segment as soon as its line arrives.
 """
 import asyncio
-import subprocess
-import tempfile
+import io
+from collections.abc import AsyncIterator
+from contextlib import aclosing
 from pathlib import Path
 
 import edge_tts
 
+import native
+
+try:
+    import config
+    _TTS_CONCURRENCY = getattr(config, "TTS_CONCURRENCY", 8)
+except ImportError:
+    _TTS_CONCURRENCY = 8
+
 # Voice mapping: Host A (female), Host B (male). Use en-US by default.
 VOICE_HOST_A = "en-US-AriaNeural"
 VOICE_HOST_B = "en-US-GuyNeural"
@@ -19,17 +30,25 @@ def _voice_for_speaker(speaker: str) -> str:
     return VOICE_HOST_A if speaker.strip() == "Host A" else VOICE_HOST_B
 
 
-async def _synthesize_segment(text: str, voice: str, path: str) -> None:
-    """Generate one MP3 segment via edge-tts."""
+async def _synthesize_segment(text: str, voice: str, out) -> None:
+    """Stream one MP3 segment via edge-tts into the binary file-like out."""
     if not text or not text.strip():
         return
     communicate = edge_tts.Communicate(text.strip(), voice)
-    await communicate.save(path)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            out.write(chunk["data"])
+
+
+async def _bounded(sem: asyncio.Semaphore, coro):
+    """Await coro while holding sem (caps concurrent Edge TTS connections)."""
+    async with sem:
+        return await coro
 
 
 def synthesize_podcast(script: list[dict], output_path: str) -> str:
     """
-    Generate audio for each script line with edge-tts, then merge into one MP3.
+    Generate audio for each script line with edge-tts, then write the segments into one MP3.
     script: list of {"speaker": "Host A"|"Host B", "text": "..."}
     Returns output_path. Raises on failure (e.g. network, unsupported voice).
     """
@@ -39,65 +58,89 @@ def synthesize_podcast(script: list[dict], output_path: str) -> str:
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    temp_dir = Path(tempfile.mkdtemp())
-    temp_files = []
+    # One buffer per spoken line, in script order; blank lines are skipped
+    items = [
+        (io.BytesIO(), item.get("speaker", "Host A"), item.get("text", ""))
+        for item in script
+        if item.get("text") and item["text"].strip()
+    ]
 
     async def run_all():
-        for i, item in enumerate(script):
-            speaker = item.get("speaker", "Host A")
-            text = item.get("text", "")
-            if not text:
-                continue
-            voice = _voice_for_speaker(speaker)
-            segment_path = temp_dir / f"seg_{i:04d}.mp3"
-            temp_files.append(segment_path)
-            await _synthesize_segment(text, voice, str(segment_path))
+        # Each segment is an independent Edge TTS round trip; run them concurrently, at most TTS_CONCURRENCY at once
+        sem = asyncio.Semaphore(max(1, _TTS_CONCURRENCY))
+        await asyncio.gather(
+            *(_bounded(sem, _synthesize_segment(text, _voice_for_speaker(speaker), buf))
+              for buf, speaker, text in items)
+        )
 
     try:
-        asyncio.run(run_all())
+        # On a native thread under gevent: asyncio allows one running loop per OS thread
+        native.call(asyncio.run, run_all())
     except Exception as e:
-        for f in temp_files:
-            try:
-                f.unlink(missing_ok=True)
-            except OSError:
-                pass
-        try:
-            temp_dir.rmdir()
-        except OSError:
-            pass
         raise RuntimeError(f"TTS failed: {e}") from e
 
-    # Merge with ffmpeg concat (avoids pydub/audioop dependency)
-    segments = sorted(temp_dir.glob("seg_*.mp3"))
-    try:
-        if segments:
-            list_file = temp_dir / "concat.txt"
-            list_file.write_text(
-                "\n".join(f"file '{p.resolve()}'" for p in segments),
-                encoding="utf-8",
-            )
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-f", "concat",
-                    "-safe", "0",
-                    "-i", str(list_file),
-                    "-c", "copy",
-                    str(output_path),
-                ],
-                check=True,
-                capture_output=True,
-            )
-    finally:
-        for f in temp_files:
-            try:
-                f.unlink(missing_ok=True)
-            except OSError:
-                pass
-        try:
-            temp_dir.rmdir()
-        except OSError:
-            pass
+    # MP3 frames concatenate cleanly, so the episode is the segments written back to back
+    if items:
+        with open(output_path, "wb") as out:
+            for buf, _, _ in items:
+                out.write(buf.getbuffer())
 
     return str(output_path)
+
+
+def synthesize_podcast_stream(script_stream: AsyncIterator[dict | None], output_path: str) -> list[dict]:
+    """
+    synthesize_podcast for a script that is still being generated: each line from script_stream is sent to
+    edge-tts as soon as it arrives (at most TTS_CONCURRENCY at once) while the rest of the script streams in.
+    A None item restarts the script (the generator is regenerating it): lines so far are dropped with their audio.
+    script_stream must be an async generator (it is closed when synthesis ends). Returns the full script. Errors from script_stream propagate unchanged; TTS failures raise RuntimeError.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    script = []
+    buffers = []
+
+    async def cancel(tasks):
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_all():
+        sem = asyncio.Semaphore(max(1, _TTS_CONCURRENCY))
+        tasks = []
+        try:
+            # Closed on this loop even on failure, so the Gemini stream and its client are released here
+            async with aclosing(script_stream) as items:
+                async for item in items:
+                    if item is None:
+                        await cancel(tasks)
+                        tasks.clear()
+                        buffers.clear()
+                        script.clear()
+                        continue
+                    script.append(item)
+                    text = item.get("text", "")
+                    if text and text.strip():
+                        buf = io.BytesIO()
+                        buffers.append(buf)
+                        voice = _voice_for_speaker(item.get("speaker", "Host A"))
+                        tasks.append(asyncio.create_task(_bounded(sem, _synthesize_segment(text, voice, buf))))
+        except BaseException:
+            await cancel(tasks)
+            raise
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            raise RuntimeError(f"TTS failed: {e}") from e
+
+    # The whole pipeline (Gemini stream + TTS) runs on a native thread under gevent, like synthesize_podcast
+    native.call(asyncio.run, run_all())
+    if not script:
+        raise ValueError("Script is empty.")
+
+    if buffers:
+        with open(output_path, "wb") as out:
+            for buf in buffers:
+                out.write(buf.getbuffer())
+
+    return script
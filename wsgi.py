@@ -0,0 +1,19 @@
+"""
+Production entry point for AuraCast: gevent WSGI server.
+monkey.patch_all() must run before Flask, google.genai or config are imported,
+so Gemini HTTP calls and Edge TTS connections yield to other requests while waiting.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import os  # noqa: E402
+
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+from app import app, start_background  # noqa: E402
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5001))
+    start_background()
+    WSGIServer(("0.0.0.0", port), app).serve_forever()